@@ -0,0 +1,3 @@
+# Face recognition attendance: enrollment, recognition and attendance logging
+# The command line entry point is attendance_cli.main (the face-attendance script);
+# the other scripts run as python -m face_attendance.<module>.
@@ -0,0 +1,166 @@
+import os
+import numpy as np
+from .encoding_format import ENCODING_SIZE
+from .face_matcher import DEFAULT_REDUCTION, rerank_candidates
+
+INDEX_VERSION = 1
+ANN_MIN_GALLERY_SIZE = 20000  # Below this an exact scan is already fast enough
+DEFAULT_NPROBE = 8  # Lists searched per face: raise for recall, lower for speed
+RERANK_IDENTITIES = 16  # Candidate identities per face re-scored exactly over all their templates
+KMEANS_ITERATIONS = 15
+KMEANS_MAX_TRAIN = 64  # Training samples per list; k-means on the whole gallery adds little
+RETRAIN_GROWTH = 4  # Retrain once the gallery is this many times larger than at training time
+ASSIGN_CHUNK = 8192  # Rows assigned at a time, bounds the (chunk, nlist) distance matrix
+
+
+# A good default list count grows with the square root of the gallery size
+def default_nlist(size):
+    return int(max(1, min(size, 2 * np.sqrt(size))))
+
+
+# Nearest centroid for every row, computed in chunks to keep memory bounded
+def assign_to_centroids(vectors, centroids):
+    centroid_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start:start + ASSIGN_CHUNK]
+        # |x|^2 is the same for every centroid, so it can be left out of the argmin
+        scores = centroid_sq_norms[None, :] - 2.0 * (chunk @ centroids.T)
+        labels[start:start + ASSIGN_CHUNK] = np.argmin(scores, axis=1)
+    return labels
+
+
+# Plain Lloyd k-means with NumPy only; empty clusters are re-seeded from random rows
+def kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+
+        # Sum each cluster with one reduceat over rows sorted by label
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+    return centroids
+
+
+# Inverted-file index over the gallery: k-means coarse quantizer plus one row list per centroid
+# Search probes the nprobe closest lists and re-ranks their rows with the exact distance
+class IVFIndex:
+    def __init__(self, centroids, labels=None, nprobe=DEFAULT_NPROBE, trained_size=0, build_id=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        self.labels = np.empty(0, dtype=np.int32) if labels is None else np.asarray(labels, dtype=np.int32)
+        self.nprobe = nprobe
+        self.trained_size = trained_size
+        self.build_id = build_id
+        self.rebuild_lists()
+
+    def __len__(self):
+        return len(self.labels)
+
+    # Train the coarse quantizer on a sample of the gallery and index every row
+    @classmethod
+    def train(cls, gallery, nlist=None, nprobe=DEFAULT_NPROBE, seed=0):
+        size = len(gallery)
+        nlist = nlist or default_nlist(size)
+        rng = np.random.default_rng(seed)
+        sample_size = min(size, nlist * KMEANS_MAX_TRAIN)
+        sample = gallery.encodings[np.sort(rng.choice(size, sample_size, replace=False))]
+
+        index = cls(kmeans(sample, nlist, seed=seed), nprobe=nprobe, trained_size=size, build_id=gallery.build_id)
+        index.add(gallery.encodings)
+        return index
+
+    # Rows of every list as one CSR-style array: list i is rows[offsets[i]:offsets[i + 1]]
+    def rebuild_lists(self):
+        self.rows = np.argsort(self.labels, kind="stable").astype(np.int64)
+        counts = np.bincount(self.labels, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    # Index new gallery rows; they are numbered after the rows already indexed
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        if len(vectors) == 0:
+            return
+        self.labels = np.concatenate([self.labels, assign_to_centroids(vectors, self.centroids)])
+        self.rebuild_lists()
+
+    # Approximate top-k identities for every face, in the same shape face_matcher.match_faces returns
+    def search(self, gallery, face_encodings, k=1, nprobe=None, reduce=DEFAULT_REDUCTION):
+        faces = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        # Closest lists for every face in one batch
+        centroid_scores = np.einsum("ij,ij->i", self.centroids, self.centroids)[None, :] - 2.0 * (faces @ self.centroids.T)
+        probes = np.argpartition(centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for face, probe in zip(faces, probes):
+            candidates = np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+            if len(candidates) == 0:
+                results.append([])
+                continue
+
+            # Rank candidate templates, then re-rank the identities of the closest ones exactly,
+            # over all of their templates, including ones in unprobed lists
+            sq_dist = gallery.sq_norms[candidates] + face @ face - 2.0 * (gallery.encodings[candidates] @ face)
+            ranked = candidates[np.argsort(sq_dist)]
+            results.append(rerank_candidates(gallery, face, ranked, k, RERANK_IDENTITIES, reduce))
+        return results
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, version=INDEX_VERSION, centroids=self.centroids, labels=self.labels,
+                     trained_size=self.trained_size, build_id=str(self.build_id))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, nprobe=DEFAULT_NPROBE):
+        with np.load(path) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"Unsupported index version {int(data['version'])}")
+            return cls(data["centroids"], data["labels"], nprobe=nprobe,
+                       trained_size=int(data["trained_size"]), build_id=str(data["build_id"]))
+
+
+# The index is persisted next to the database as face_data.ivf.npz
+def index_path(db_path):
+    return os.path.splitext(db_path)[0] + ".ivf.npz"
+
+
+# Open the persisted index for a gallery, bringing it up to date first
+# New enrollments appended to the snapshot are inserted incrementally; the index is retrained
+# when the snapshot was rebuilt or has grown well past the size it was trained at.
+# Returns None for small galleries, where callers should keep using the exact search.
+def open_index(db_path, gallery, nprobe=DEFAULT_NPROBE, min_size=ANN_MIN_GALLERY_SIZE):
+    if len(gallery) < max(min_size, 1):
+        return None
+
+    path = index_path(db_path)
+    index = None
+    if os.path.exists(path):
+        try:
+            index = IVFIndex.load(path, nprobe=nprobe)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable ANN index {path}: {e}")
+
+    if (index is None or index.build_id != str(gallery.build_id) or len(index) > len(gallery)
+            or len(gallery) > RETRAIN_GROWTH * index.trained_size):
+        print(f"Training ANN index over {len(gallery)} encodings...")
+        index = IVFIndex.train(gallery, nprobe=nprobe)
+        index.save(path)
+    elif len(index) < len(gallery):
+        index.add(gallery.encodings[len(index):])
+        index.save(path)
+
+    return index
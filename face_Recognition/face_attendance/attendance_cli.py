@@ -0,0 +1,175 @@
+import argparse
+import os
+import sys
+from .attendance_dedup import AUTO_LOG_COOLDOWN
+from .face_db import COMMIT_EVERY, DEFAULT_DB_PATH
+from .face_matcher import DEFAULT_PRECISION
+from .quantized_index import PRECISIONS
+
+# Command line entry point: face-attendance <command>
+# Subcommand modules are imported inside the handlers, and face_recognition itself only
+# loads on first use (see face_models.py), so --help and database-only commands start
+# without importing OpenCV or loading the dlib models. Defaults come from the modules
+# that own them; those imported above need only NumPy and sqlite3.
+
+
+def run_init_db(args):
+    from .face_db import init_db
+
+    init_db(args.db)
+
+
+def run_people(args):
+    from .face_db import get_connection
+
+    cursor = get_connection(args.db).cursor()
+    cursor.execute('''SELECT f.id, f.name, COUNT(t.template_id)
+                      FROM faces f LEFT JOIN face_templates t ON t.user_id = f.id
+                      GROUP BY f.id ORDER BY f.name, f.id''')
+    rows = cursor.fetchall()
+    for user_id, name, templates in rows:
+        print(f"{user_id}\t{name}\t{templates} templates")
+    print(f"{len(rows)} people enrolled")
+
+
+def run_export(args):
+    from .attendance_log import export_attendance_csv
+
+    export_attendance_csv(args.db, args.output, args.since)
+
+
+def run_enroll(args):
+    from .face_db import init_db
+
+    init_db(args.db)
+    if args.source is None:
+        # One person from the webcam, with the quality-gated capture
+        if args.db != DEFAULT_DB_PATH:
+            print(f"Error: Webcam enrollment always uses {DEFAULT_DB_PATH}.")
+            return 1
+        from .updated_capture_new import capture_and_store_face
+
+        capture_and_store_face(args.name, args.id)
+        return 0
+
+    from .bulk_enroll import bulk_enroll, read_directory, read_roster
+
+    people = read_directory(args.source) if os.path.isdir(args.source) else read_roster(args.source)
+    bulk_enroll(people, args.db, args.workers, args.model, args.commit_every, args.failures)
+    return 0
+
+
+def run_recognize(args):
+    from .face_db import init_db
+    from .face_models import warm_up
+
+    init_db(args.db)
+    if args.warm_up:
+        warm_up()
+
+    if args.cameras:
+        from .multi_camera import parse_source, run_streams
+
+        run_streams([parse_source(source) for source in args.cameras], show=not args.headless,
+                    use_tracking=not args.no_tracking, use_gate=not args.no_gate, log_cooldown=args.cooldown,
+                    live_reload=not args.no_reload, metrics_port=args.metrics_port, metrics_file=args.metrics_file,
+                    use_encoding_cache=args.encoding_cache, gallery_precision=args.precision, db_path=args.db)
+        return 0
+
+    from .updated_recognize_attendance import recognize_and_log_face
+
+    recognize_and_log_face(use_pipeline=args.pipeline, use_tracking=not args.no_tracking, use_gate=not args.no_gate,
+                           use_encoding_cache=args.encoding_cache, log_cooldown=args.cooldown,
+                           live_reload=not args.no_reload, metrics_port=args.metrics_port,
+                           metrics_file=args.metrics_file, gallery_precision=args.precision, db_path=args.db)
+    return 0
+
+
+def run_serve(args):
+    from .face_db import init_db
+    from .face_models import warm_up
+    from .recognition_service import run_service
+
+    init_db(args.db)
+    if args.warm_up:
+        warm_up(args.model)
+    run_service(args.host, args.port, args.db, args.max_batch, args.max_wait_ms / 1000, args.max_queued,
+                args.workers, args.model, metrics_port=args.metrics_port, metrics_file=args.metrics_file,
+                gallery_precision=args.precision)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="face-attendance", description="Face recognition attendance.")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    command = commands.add_parser("init-db", help="create or upgrade the database schema")
+    command.add_argument("--db", default=DEFAULT_DB_PATH)
+    command.set_defaults(handler=run_init_db)
+
+    command = commands.add_parser("people", help="list enrolled people")
+    command.add_argument("--db", default=DEFAULT_DB_PATH)
+    command.set_defaults(handler=run_people)
+
+    command = commands.add_parser("export", help="write attendance events to a CSV file")
+    command.add_argument("output", nargs="?", default="recognition_log.csv")
+    command.add_argument("--db", default=DEFAULT_DB_PATH)
+    command.add_argument("--since", help="only events at or after this time, e.g. '2024-01-31 00:00:00'")
+    command.set_defaults(handler=run_export)
+
+    command = commands.add_parser("enroll", help="enroll one person from the webcam, or many from photos")
+    command.add_argument("source", nargs="?", help="directory with one <id>_<name> folder per person, or a CSV "
+                                                   "roster with id,name,image_paths columns (default: webcam)")
+    command.add_argument("--name", help="name of the person (webcam enrollment)")
+    command.add_argument("--id", help="ID of the person (webcam enrollment)")
+    command.add_argument("--db", default=DEFAULT_DB_PATH)
+    command.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    command.add_argument("--model", choices=["hog", "cnn"], default="hog")
+    command.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="people per transaction")
+    command.add_argument("--failures", default="enroll_failures.csv", help="CSV report of skipped photos")
+    command.set_defaults(handler=run_enroll)
+
+    command = commands.add_parser("recognize", help="recognize faces from the webcam and log attendance")
+    command.add_argument("--cameras", nargs="+", help="several camera indices, video files or stream URLs")
+    command.add_argument("--headless", action="store_true", help="do not open windows (with --cameras)")
+    command.add_argument("--pipeline", action="store_true", help="run capture, inference and display in parallel")
+    command.add_argument("--no-tracking", action="store_true", help="run full detection on every frame")
+    command.add_argument("--no-gate", action="store_true", help="run dlib on every frame, even without motion")
+    command.add_argument("--no-reload", action="store_true", help="do not pick up enrollments while running")
+    command.add_argument("--encoding-cache", action="store_true",
+                         help="reuse encodings of face crops that have not changed")
+    command.add_argument("--db", default=DEFAULT_DB_PATH)
+    command.add_argument("--cooldown", type=float, default=AUTO_LOG_COOLDOWN,
+                         help="seconds before the same person is logged again")
+    command.add_argument("--warm-up", action="store_true", help="load the face models before opening cameras")
+    command.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION,
+                         help="gallery storage; int8 and pq search compressed codes with a float re-rank")
+    command.add_argument("--metrics-port", type=int, default=None)
+    command.add_argument("--metrics-file", default=None)
+    command.set_defaults(handler=run_recognize)
+
+    command = commands.add_parser("serve", help="headless recognition over local HTTP")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8765)
+    command.add_argument("--db", default=DEFAULT_DB_PATH)
+    command.add_argument("--max-batch", type=int, default=16)
+    command.add_argument("--max-wait-ms", type=float, default=5.0)
+    command.add_argument("--max-queued", type=int, default=64)
+    command.add_argument("--workers", type=int, default=1)
+    command.add_argument("--model", choices=["hog", "cnn"], default="hog")
+    command.add_argument("--warm-up", action="store_true", help="load the face models before accepting requests")
+    command.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION,
+                         help="gallery storage; int8 and pq search compressed codes with a float re-rank")
+    command.add_argument("--metrics-port", type=int, default=None)
+    command.add_argument("--metrics-file", default=None)
+    command.set_defaults(handler=run_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
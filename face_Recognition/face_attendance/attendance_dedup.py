@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+CONFIRM_COOLDOWN = 3.0  # Seconds before a confirmed or dismissed person is offered again
+AUTO_LOG_COOLDOWN = 300.0  # Seconds before an automatically logged person is logged again
+CONFIRM_TIMEOUT = 15.0  # Seconds a confirmation waits for the operator before it is dropped
+
+
+# Per-user-id cooldown windows
+# A user id that was logged less than cooldown seconds ago is suppressed. Entries are kept
+# in last-logged order, so expired ones are dropped from the front. Only expired entries are
+# ever dropped, so the structure holds at most the people logged within one cooldown.
+class AttendanceDeduper:
+    def __init__(self, cooldown=AUTO_LOG_COOLDOWN):
+        self.cooldown = cooldown
+        self.last_logged = OrderedDict()
+        self.lock = threading.Lock()
+        self.logged = 0
+        self.suppressed = 0
+
+    def in_cooldown(self, user_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            return user_id in self.last_logged
+
+    # Start a cooldown window for user_id
+    def mark(self, user_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            self.record(user_id, now)
+
+    # True (and the window starts) when user_id is outside its cooldown
+    # The check and the new window happen under one lock, so of several threads that see the
+    # same user at once exactly one gets True.
+    def check_and_mark(self, user_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            if user_id in self.last_logged:
+                self.suppressed += 1
+                return False
+            self.logged += 1
+            self.record(user_id, now)
+            return True
+
+    # Called with the lock held
+    def record(self, user_id, now):
+        self.last_logged[user_id] = now
+        self.last_logged.move_to_end(user_id)
+
+    # Drop ids whose cooldown is over; called with the lock held
+    def expire(self, now):
+        while self.last_logged:
+            user_id, logged_at = next(iter(self.last_logged.items()))
+            if now - logged_at < self.cooldown:
+                break
+            del self.last_logged[user_id]
+
+    def stats(self):
+        with self.lock:
+            return {"tracked_ids": len(self.last_logged), "logged": self.logged, "suppressed": self.suppressed}
+
+
+# Recognitions waiting for the operator to confirm them
+# The recognition loop offers matches and never waits; the UI shows current() and calls
+# confirm() or dismiss() when a key arrives. Either answer starts the user's cooldown, and
+# requests nobody answers within timeout seconds are dropped.
+class PendingConfirmations:
+    def __init__(self, deduper, timeout=CONFIRM_TIMEOUT):
+        self.deduper = deduper
+        self.timeout = timeout
+        self.pending = OrderedDict()  # user_id -> (name, user_id, offered_at), oldest first
+        self.lock = threading.Lock()
+        self.confirmed = 0
+        self.dismissed = 0
+        self.timed_out = 0
+
+    # Queue a recognition unless the user is already pending or in cooldown; returns True if queued
+    def offer(self, name, user_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            if user_id in self.pending or self.deduper.in_cooldown(user_id, now):
+                return False
+            self.pending[user_id] = (name, user_id, now)
+            return True
+
+    # Oldest pending (name, user_id), or None
+    def current(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            if not self.pending:
+                return None
+            name, user_id, _ = next(iter(self.pending.values()))
+            return name, user_id
+
+    # Accept the oldest pending recognition; returns (name, user_id) to log, or None
+    def confirm(self, now=None):
+        answered = self.answer(now)
+        if answered is not None:
+            self.confirmed += 1
+        return answered
+
+    # Reject the oldest pending recognition; returns the dismissed (name, user_id), or None
+    def dismiss(self, now=None):
+        answered = self.answer(now)
+        if answered is not None:
+            self.dismissed += 1
+        return answered
+
+    def answer(self, now):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            if not self.pending:
+                return None
+            _, (name, user_id, _) = self.pending.popitem(last=False)
+        self.deduper.mark(user_id, now)
+        return name, user_id
+
+    # Drop requests older than timeout; called with the lock held
+    def expire(self, now):
+        while self.pending:
+            _, _, offered_at = next(iter(self.pending.values()))
+            if now - offered_at < self.timeout:
+                break
+            self.pending.popitem(last=False)
+            self.timed_out += 1
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": len(self.pending),
+                "confirmed": self.confirmed,
+                "dismissed": self.dismissed,
+                "timed_out": self.timed_out,
+            }
@@ -0,0 +1,211 @@
+import atexit
+import csv
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from .face_db import connect, get_connection, transaction
+from .metrics import DISABLED
+
+FLUSH_BATCH_SIZE = 64  # Events written per transaction at most
+FLUSH_INTERVAL = 0.5  # Seconds an event may wait in the queue before it is written
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'  # Same format recognition_log.csv has always used
+
+
+# Background writer for attendance events
+# log() only puts the event on a queue, so the frame loop never waits on the disk.
+# The writer thread keeps its own SQLite connection (WAL mode, see face_db.py) and, when csv_path is set,
+# one open CSV handle, and writes events in batches of up to batch_size or every
+# flush_interval seconds with executemany. close() writes everything still queued;
+# it is also registered with atexit so events survive an early exit. Events logged after
+# close() are written synchronously on the caller's thread instead of being queued, and so
+# is everything once the thread has failed to open the database or the CSV file. A batch the
+# database rejects is counted as failed and left out of the CSV.
+# Each batch write is timed as the attendance_write stage of metrics.
+class AttendanceLogWriter(threading.Thread):
+    def __init__(self, db_path="face_data.db", csv_path=None, batch_size=FLUSH_BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, metrics=DISABLED):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.metrics = metrics
+        self.events = queue.Queue()
+        self.closed = False
+        self.close_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.csv_failed = 0
+
+    def start(self):
+        super().start()
+        atexit.register(self.close)
+
+    # Queue one recognition; the timestamp is taken now, not when the event is written
+    def log(self, name, user_id, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        event = (user_id, name, timestamp)
+        # Checked under close_lock so nothing is queued behind the stop marker close() puts
+        with self.close_lock:
+            if not self.closed:
+                self.events.put(event)
+                return
+        self.write_now([event])
+
+    # Write events directly, for the ones that arrive once the writer thread has stopped
+    def write_now(self, batch):
+        if not batch:
+            return
+        try:
+            conn = connect(self.db_path)
+        except sqlite3.Error as e:
+            print(f"Error writing {len(batch)} attendance events: {e}")
+            self.failed += len(batch)
+            return
+        csv_file = self.open_csv()
+        try:
+            self.flush(conn, csv_file, batch)
+        finally:
+            conn.close()
+            if csv_file:
+                csv_file.close()
+
+    # The CSV file to append to, or None when there is none or it cannot be opened
+    def open_csv(self):
+        if not self.csv_path:
+            return None
+        try:
+            return open(self.csv_path, mode='a', newline='')
+        except OSError as e:
+            print(f"Error opening {self.csv_path}: {e}")
+            return None
+
+    # Stop accepting work and wait until every queued event is written
+    def close(self):
+        with self.close_lock:
+            if self.closed:
+                return
+            self.closed = True
+        if self.is_alive():
+            self.events.put(None)
+            self.join()
+
+    def run(self):
+        conn = None
+        csv_file = None
+        try:
+            # A private connection: SQLite connections belong to the thread that opened them
+            conn = connect(self.db_path)
+            if self.csv_path:
+                csv_file = open(self.csv_path, mode='a', newline='')
+
+            stopping = False
+            while not stopping:
+                event = self.events.get()
+                if event is None:
+                    break
+                batch = [event]
+
+                # Collect more events until the batch is full or the oldest one has waited long enough
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        event = self.events.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if event is None:
+                        stopping = True
+                        break
+                    batch.append(event)
+
+                with self.metrics.stage("attendance_write"):
+                    self.flush(conn, csv_file, batch)
+        except (sqlite3.Error, OSError) as e:
+            # The thread cannot write: stop queueing and write what is queued, and anything
+            # logged from now on, synchronously (failures are counted in stats())
+            print(f"Error: Attendance writer stopped: {e}")
+            with self.close_lock:
+                self.closed = True
+            self.write_now(self.drain())
+        finally:
+            if conn is not None:
+                conn.close()
+            if csv_file:
+                csv_file.close()
+
+    # Events still queued, without the stop marker
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return batch
+            if event is not None:
+                batch.append(event)
+
+    # The CSV only gets the rows the database accepted, so the two never disagree
+    def flush(self, conn, csv_file, batch):
+        try:
+            with transaction(conn) as cursor:
+                cursor.executemany("INSERT INTO attendance (user_id, name, recognized_at) VALUES (?, ?, ?)", batch)
+        except sqlite3.Error as e:
+            print(f"Error writing {len(batch)} attendance events: {e}")
+            self.failed += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+        if self.csv_path and csv_file is None:
+            self.csv_failed += len(batch)
+        elif csv_file:
+            try:
+                # Log entry format: name, id, timestamp
+                csv.writer(csv_file).writerows([(name, user_id, timestamp) for user_id, name, timestamp in batch])
+                csv_file.flush()
+            except OSError as e:
+                print(f"Error writing {len(batch)} attendance events to {self.csv_path}: {e}")
+                self.csv_failed += len(batch)
+
+    def stats(self):
+        return {
+            "queued": self.events.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "csv_failed": self.csv_failed,
+        }
+
+
+# Write the attendance table to a CSV file in the recognition_log.csv format
+def export_attendance_csv(db_path="face_data.db", csv_path="recognition_log.csv", since=None):
+    cursor = get_connection(db_path).cursor()
+    if since is None:
+        cursor.execute("SELECT name, user_id, recognized_at FROM attendance ORDER BY recognized_at, event_id")
+    else:
+        cursor.execute("SELECT name, user_id, recognized_at FROM attendance WHERE recognized_at >= ? "
+                       "ORDER BY recognized_at, event_id", (since,))
+
+    with open(csv_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        count = 0
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            writer.writerows(rows)
+            count += len(rows)
+    print(f"Exported {count} attendance events to {csv_path}")
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+    export_attendance_csv(*sys.argv[1:4])
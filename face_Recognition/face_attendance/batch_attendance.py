@@ -0,0 +1,211 @@
+import argparse
+import csv
+import os
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+import cv2
+from .face_models import face_recognition
+from .attendance_dedup import AUTO_LOG_COOLDOWN, AttendanceDeduper
+from .attendance_log import TIMESTAMP_FORMAT, AttendanceLogWriter
+from .face_matcher import DEFAULT_THRESHOLD, identify_faces
+from .gallery_snapshot import open_gallery
+from .shared_gallery import SharedGallery, publish_gallery, remove_shared_gallery, shared_gallery_path
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+SEGMENT_FRAMES = 900  # Video frames per task; several tasks per worker keep the pool balanced
+IMAGES_PER_TASK = 64
+CNN_BATCH_SIZE = 32  # Frames per batch_face_locations call on the CNN path
+
+# Per-process state, set up once by init_worker
+worker_gallery = None
+worker_options = None
+
+
+def init_worker(gallery_path, options):
+    global worker_gallery, worker_options
+    # Workers map the gallery published by run_batch, so adding workers adds no gallery memory
+    worker_gallery = SharedGallery(gallery_path)
+    worker_options = options
+
+
+# Split every input into tasks: (kind, source, first_frame, last_frame) for videos,
+# (kind, source, paths) for image directories
+def plan_tasks(sources, frame_step):
+    tasks = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                           if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+            for start in range(0, len(paths), IMAGES_PER_TASK):
+                tasks.append(("images", source, paths[start:start + IMAGES_PER_TASK]))
+        else:
+            cam = cv2.VideoCapture(source)
+            if not cam.isOpened():
+                print(f"Error: Could not open {source}. Skipping it.")
+                continue
+            frame_count = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+            cam.release()
+            segment = max(frame_step, SEGMENT_FRAMES - SEGMENT_FRAMES % frame_step)
+            for start in range(0, frame_count, segment):
+                tasks.append(("video", source, start, min(frame_count, start + segment)))
+    return tasks
+
+
+# Stream (frame_label, seconds, bgr_frame) for one task without holding the segment in memory
+def iter_task_frames(task, frame_step):
+    if task[0] == "images":
+        for path in task[2]:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"Error: Could not read {path}. Skipping it.")
+                continue
+            yield os.path.basename(path), None, frame
+        return
+
+    _, source, first_frame, last_frame = task
+    cam = cv2.VideoCapture(source)
+    fps = cam.get(cv2.CAP_PROP_FPS) or 0
+    cam.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+    for frame_index in range(first_frame, last_frame):
+        # grab() skips decoding the frames we do not analyse
+        if (frame_index - first_frame) % frame_step:
+            if not cam.grab():
+                break
+            continue
+        ret, frame = cam.read()
+        if not ret:
+            break
+        yield frame_index, frame_index / fps if fps else None, frame
+    cam.release()
+
+
+# Group a frame stream into lists of at most size frames
+def batched(frames, size):
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Worker: detect, encode and identify every frame of one task
+# Returns (source, frames_processed, result_rows)
+def process_task(task):
+    options = worker_options
+    batch_size = CNN_BATCH_SIZE if options["model"] == "cnn" else 1
+    rows = []
+    processed = 0
+
+    for batch in batched(iter_task_frames(task, options["frame_step"]), batch_size):
+        rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for _, _, frame in batch]
+        if options["model"] == "cnn":
+            # One GPU/CNN call for the whole batch
+            locations_batch = face_recognition.batch_face_locations(rgb_frames, batch_size=len(rgb_frames))
+        else:
+            locations_batch = [face_recognition.face_locations(rgb_img) for rgb_img in rgb_frames]
+
+        for (label, seconds, _), rgb_img, face_locations in zip(batch, rgb_frames, locations_batch):
+            processed += 1
+            if not face_locations:
+                continue
+            face_encodings = face_recognition.face_encodings(rgb_img, face_locations)
+            for name, user_id, distance in identify_faces(worker_gallery, face_encodings, options["threshold"]):
+                if user_id is None and not options["include_unknown"]:
+                    continue
+                rows.append([task[1], label, "" if seconds is None else f"{seconds:.3f}", name, user_id,
+                             "" if distance is None else f"{distance:.4f}"])
+
+    return task[1], processed, rows
+
+
+# Log each recognized person at most once per cooldown window of recording time, like a live
+# recognizer watching the same footage; image folders have no timeline, so once per folder
+# Events are timestamped recorded_at + seconds into the video when the recording start is
+# known, and with the time of processing otherwise. Returns how many events were logged.
+def log_attendance(rows, deduper, attendance_log, recorded_at=None):
+    logged = 0
+    for _, _, seconds, name, user_id, _ in rows:
+        if user_id is None:
+            continue
+        offset = float(seconds) if seconds else 0.0
+        if not deduper.check_and_mark(user_id, offset):
+            continue
+        timestamp = None
+        if recorded_at is not None and seconds:
+            timestamp = (recorded_at + timedelta(seconds=offset)).strftime(TIMESTAMP_FORMAT)
+        attendance_log.log(name, user_id, timestamp)
+        logged += 1
+    return logged
+
+
+# Recognize faces in recorded videos and image folders across a process pool, write every
+# recognition to one CSV report in bulk, and log attendance for the people recognized
+# Results come back in task order, so each source's recognitions reach its deduper in frame order
+def run_batch(sources, output_path, db_path="face_data.db", workers=None, frame_step=1, model="hog",
+              threshold=DEFAULT_THRESHOLD, include_unknown=False, log_cooldown=AUTO_LOG_COOLDOWN, recorded_at=None):
+    tasks = plan_tasks(sources, frame_step)
+    options = {"frame_step": frame_step, "model": model, "threshold": threshold, "include_unknown": include_unknown}
+
+    # Load the gallery once here and publish it, grouping included, for every worker to map
+    gallery_path = shared_gallery_path(f"face_gallery_batch_{os.getpid()}")
+    publish_gallery(open_gallery(db_path), gallery_path)
+
+    # Attendance events go to the same table the live recognizers write, so export and people see them
+    attendance_log = AttendanceLogWriter(db_path)
+    attendance_log.start()
+    dedupers = {}
+
+    started = time.monotonic()
+    total_frames = 0
+    total_rows = 0
+    total_logged = 0
+    try:
+        with open(output_path, mode="w", newline="") as file, \
+                Pool(workers, initializer=init_worker, initargs=(gallery_path, options)) as pool:
+            writer = csv.writer(file)
+            writer.writerow(["source", "frame", "seconds", "name", "id", "distance"])
+
+            for source, processed, rows in pool.imap(process_task, tasks):
+                writer.writerows(rows)
+                deduper = dedupers.setdefault(source, AttendanceDeduper(log_cooldown))
+                total_logged += log_attendance(rows, deduper, attendance_log, recorded_at)
+                total_frames += processed
+                total_rows += len(rows)
+                elapsed = time.monotonic() - started
+                print(f"{total_frames} frames, {total_rows} recognitions, {total_frames / elapsed:.1f} frames/s")
+    finally:
+        remove_shared_gallery(gallery_path)
+        attendance_log.close()
+
+    elapsed = time.monotonic() - started
+    fps = total_frames / elapsed if elapsed else 0.0
+    print(f"Processed {total_frames} frames from {len(sources)} sources in {elapsed:.1f}s "
+          f"({fps:.1f} frames/s), wrote {total_rows} recognitions to {output_path} "
+          f"and logged {total_logged} attendance events")
+    return {"frames": total_frames, "recognitions": total_rows, "attendance_events": total_logged,
+            "seconds": elapsed, "frames_per_second": fps}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill attendance from recorded videos and image folders.")
+    parser.add_argument("sources", nargs="+", help="video files or directories of images")
+    parser.add_argument("--output", default="batch_recognition_log.csv", help="CSV report of every recognition")
+    parser.add_argument("--db", default="face_data.db")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument("--every", type=int, default=1, help="analyse every Nth video frame")
+    parser.add_argument("--model", choices=["hog", "cnn"], default="hog")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--include-unknown", action="store_true", help="also write faces that did not match")
+    parser.add_argument("--cooldown", type=float, default=AUTO_LOG_COOLDOWN,
+                        help="seconds of recording before the same person is logged again")
+    parser.add_argument("--recorded-at", help="when the videos started, e.g. '2024-01-31 08:00:00'; "
+                                              "attendance is timestamped from it (default: now)")
+    args = parser.parse_args()
+
+    recorded_at = datetime.strptime(args.recorded_at, TIMESTAMP_FORMAT) if args.recorded_at else None
+    run_batch(args.sources, args.output, args.db, args.workers, max(1, args.every), args.model,
+              args.threshold, args.include_unknown, args.cooldown, recorded_at)
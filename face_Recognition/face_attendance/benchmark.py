@@ -0,0 +1,381 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from .face_models import face_recognition
+from .ann_index import ANN_MIN_GALLERY_SIZE, IVFIndex
+from .attendance_log import AttendanceLogWriter
+from .encoding_format import ENCODING_SIZE
+from .face_db import connect
+from .face_matcher import (DEFAULT_DTYPE, DEFAULT_THRESHOLD, Gallery, identify_faces, identity_distances, load_gallery,
+                          storage_dtype)
+from .quantized_index import INDEX_TYPES, PRECISIONS
+
+BENCHMARK_VERSION = 1
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+DEFAULT_GALLERY_SIZES = [1000, 10000, 100000]
+FRAME_SIZE = (480, 640)  # Height and width of generated frames, a typical webcam resolution
+ENCODING_SCALE = 0.09  # Per-dimension spread that gives synthetic encodings a norm close to dlib's (~1)
+QUERY_NOISE = 0.02  # Spread added to gallery rows to make query faces that should match
+BORDERLINE_NOISE = (0.03, 0.07)  # Spreads that put queries about 0.35 to 0.8 from their row, across the threshold
+PARITY_QUERIES = 500  # Borderline queries checked per gallery for decision parity
+LOG_EVENTS = 10000  # Attendance events queued by the log benchmark
+
+
+# Timing summary in milliseconds for a list of per-call durations in seconds
+def summarize(samples):
+    samples = np.asarray(samples) * 1000.0
+    return {
+        "runs": len(samples),
+        "mean_ms": float(samples.mean()),
+        "median_ms": float(np.median(samples)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "min_ms": float(samples.min()),
+    }
+
+
+# Call func once per argument after warmup untimed calls and summarize the timings
+def time_calls(func, arguments, warmup=1):
+    for argument in arguments[:warmup]:
+        func(argument)
+    samples = []
+    for argument in arguments:
+        started = time.perf_counter()
+        func(argument)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+# Fixed test frames: every image in frames_dir, or generated frames when it is not given
+# Generated frames are deterministic, so runs on different commits see identical input
+def load_frames(frames_dir, count, seed=0):
+    if frames_dir:
+        paths = sorted(os.path.join(frames_dir, name) for name in os.listdir(frames_dir)
+                       if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+        frames = [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+        if not frames:
+            print(f"Error: No readable images in {frames_dir}.")
+            sys.exit(1)
+        return frames[:count] if count else frames
+
+    rng = np.random.default_rng(seed)
+    height, width = FRAME_SIZE
+    frames = []
+    for _ in range(count or 20):
+        # A smooth gradient with some noise, so the detectors scan a realistic image
+        gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+        frame = gradient + rng.normal(0, 12, (height, width, 3))
+        frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return frames
+
+
+# Synthetic gallery of size templates, templates_per_person per identity
+def synthetic_gallery(size, templates_per_person=1, seed=0, dtype=DEFAULT_DTYPE):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0, ENCODING_SCALE, (size, ENCODING_SIZE))
+    people = np.arange(size) // templates_per_person
+    ids = np.array([str(person) for person in people], dtype=object)
+    names = np.array([f"person {person}" for person in people], dtype=object)
+    return Gallery(encodings, ids, names, build_id=f"synthetic-{size}-{templates_per_person}-{seed}", dtype=dtype)
+
+
+# Query batches of faces_per_frame encodings; half are noisy copies of gallery rows, half strangers
+def synthetic_queries(gallery, batches, faces_per_frame, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(batches):
+        known = gallery.encodings[rng.integers(0, len(gallery), (faces_per_frame + 1) // 2)]
+        known = known + rng.normal(0, QUERY_NOISE, known.shape)
+        strangers = rng.normal(0, ENCODING_SCALE, (faces_per_frame // 2, ENCODING_SIZE))
+        queries.append(np.vstack([known, strangers]))
+    return queries
+
+
+# Queries made from random gallery rows with noise that spans the match threshold, where a
+# small distance error is most likely to change a decision
+def borderline_queries(gallery, count, seed=2):
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(gallery.encodings[rng.integers(0, len(gallery), count)], dtype=np.float64)
+    spread = rng.uniform(*BORDERLINE_NOISE, (count, 1))
+    return rows + rng.normal(0, 1, rows.shape) * spread
+
+
+# Boxes to encode for every frame: the detected faces, or one fixed centered box when
+# a frame has none (generated frames), so encoding is still timed on the same input
+def encoding_boxes(frames, detected):
+    boxes = []
+    for frame, locations in zip(frames, detected):
+        if locations:
+            boxes.append(locations)
+        else:
+            height, width = frame.shape[:2]
+            side = min(height, width) // 3
+            top, left = (height - side) // 2, (width - side) // 2
+            boxes.append([(top, left + side, top + side, left)])
+    return boxes
+
+
+# Per-stage timings of the frame path: color conversion, detection per model, encoding
+def benchmark_frame_stages(frames, models, results):
+    results["cvt_color"] = time_calls(lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), frames)
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+
+    detected = None
+    for model in models:
+        print(f"Timing face_locations ({model}) on {len(frames)} frames...")
+        results[f"face_locations_{model}"] = time_calls(
+            lambda rgb_img: face_recognition.face_locations(rgb_img, model=model), rgb_frames)
+        if detected is None:
+            detected = [face_recognition.face_locations(rgb_img, model=model) for rgb_img in rgb_frames]
+
+    boxes = encoding_boxes(frames, detected)
+    print(f"Timing face_encodings on {sum(len(b) for b in boxes)} faces...")
+    results["face_encodings"] = time_calls(
+        lambda item: face_recognition.face_encodings(item[0], item[1]), list(zip(rgb_frames, boxes)))
+    results["face_encodings"]["faces_per_frame"] = sum(len(b) for b in boxes) / len(boxes)
+    return rgb_frames, boxes
+
+
+# Matching cost per frame for every gallery size, exact and (for large galleries) with the IVF index
+def benchmark_matching(gallery_sizes, templates_per_person, batches, faces_per_frame, ann, results):
+    for size in gallery_sizes:
+        print(f"Building a synthetic gallery of {size} encodings...")
+        started = time.perf_counter()
+        gallery = synthetic_gallery(size, templates_per_person)
+        results[f"gallery_build_{size}"] = summarize([time.perf_counter() - started])
+        queries = synthetic_queries(gallery, batches, faces_per_frame)
+
+        results[f"match_exact_{size}"] = time_calls(
+            lambda faces: identify_faces(gallery, faces, DEFAULT_THRESHOLD), queries)
+
+        if ann and size >= ANN_MIN_GALLERY_SIZE:
+            started = time.perf_counter()
+            index = IVFIndex.train(gallery)
+            results[f"ann_train_{size}"] = summarize([time.perf_counter() - started])
+            results[f"match_ann_{size}"] = time_calls(
+                lambda faces: identify_faces(gallery, faces, DEFAULT_THRESHOLD, index=index), queries)
+
+            # Share of faces the index labels the same way the exact search does
+            agree = sum(exact[1] == approximate[1]
+                        for faces in queries
+                        for exact, approximate in zip(identify_faces(gallery, faces),
+                                                      identify_faces(gallery, faces, index=index)))
+            results[f"match_ann_{size}"]["agreement"] = agree / sum(len(faces) for faces in queries)
+        del gallery
+
+
+# Decisions as the recognizers made them before the Gallery: face_recognition.face_distance over
+# float64 templates, the closest identity if it is under the threshold. Returns (user_id or None, distance)
+def reference_decisions(gallery, queries, threshold):
+    decisions = []
+    for face in queries:
+        distances = identity_distances(gallery, face_recognition.face_distance(gallery.encodings, face)[None, :])[0]
+        best = int(np.argmin(distances))
+        decisions.append((gallery.identity_ids[best] if distances[best] < threshold else None, float(distances[best])))
+    return decisions
+
+
+# How identify_faces results differ from the reference decisions
+def parity_stats(expected, matches):
+    stats = {"queries": len(expected), "agreement": 0.0, "known_to_unknown": 0, "unknown_to_known": 0,
+             "wrong_identity": 0, "max_distance_error": 0.0}
+    for (expected_id, expected_distance), (_, user_id, distance) in zip(expected, matches):
+        if expected_id == user_id:
+            stats["agreement"] += 1
+            if user_id is not None:  # The distance of an Unknown is only that of the closest candidate found
+                stats["max_distance_error"] = max(stats["max_distance_error"], abs(distance - expected_distance))
+        elif user_id is None:
+            stats["known_to_unknown"] += 1
+        elif expected_id is None:
+            stats["unknown_to_known"] += 1
+        else:
+            stats["wrong_identity"] += 1
+    stats["agreement"] /= max(len(expected), 1)
+    return stats
+
+
+# Gallery storage precisions: bytes per template, matching cost per frame, and decision parity
+# with face_distance at the recognizers' threshold, over a float64 reference gallery
+def benchmark_precision(reference, label, batches, faces_per_frame, precisions, parity_queries, results):
+    if len(reference) == 0:
+        print(f"Error: No templates to check parity on ({label}).")
+        return
+    queries = synthetic_queries(reference, batches, faces_per_frame)
+    parity = np.vstack(queries + [borderline_queries(reference, parity_queries)])
+    print(f"Computing reference decisions for {len(parity)} queries on {len(reference)} templates...")
+    expected = reference_decisions(reference, parity, DEFAULT_THRESHOLD)
+
+    for precision in precisions:
+        gallery = Gallery(reference.encodings, reference.ids, reference.names, build_id=reference.build_id,
+                          dtype=storage_dtype(precision))
+        index = None
+        if precision in INDEX_TYPES:
+            started = time.perf_counter()
+            index = INDEX_TYPES[precision].train(gallery)
+            results[f"{precision}_train_{label}"] = summarize([time.perf_counter() - started])
+
+        name = f"match_{precision}_{label}"
+        results[name] = time_calls(lambda faces: identify_faces(gallery, faces, DEFAULT_THRESHOLD, index=index), queries)
+        results[name]["bytes_per_template"] = (index.bytes_per_template if index is not None
+                                               else gallery.encodings.itemsize * ENCODING_SIZE)
+        results[name]["parity"] = parity_stats(expected, identify_faces(gallery, parity, DEFAULT_THRESHOLD, index=index))
+        print(f"{name}: {results[name]['bytes_per_template']} bytes per template, "
+              f"{results[name]['median_ms']:.2f} ms per frame, parity {results[name]['parity']['agreement']:.2%}")
+
+
+# Attendance logging: what the frame loop pays per log() call, and how fast the writer drains
+def benchmark_logging(work_dir, events, results):
+    db_path = os.path.join(work_dir, "benchmark.db")
+    connect(db_path).close()  # Create the schema up front so it is not timed
+    writer = AttendanceLogWriter(db_path, csv_path=os.path.join(work_dir, "benchmark_log.csv"))
+    writer.start()
+    samples = []
+    started = time.perf_counter()
+    for i in range(events):
+        call_started = time.perf_counter()
+        writer.log(f"person {i % 100}", str(i % 100))
+        samples.append(time.perf_counter() - call_started)
+    writer.close()
+    elapsed = time.perf_counter() - started
+
+    results["attendance_log_call"] = summarize(samples)
+    # Normalized per event, so reports with different --log-events still compare
+    results["attendance_log_drain_per_event"] = summarize([elapsed / events])
+    results["attendance_log_drain_per_event"]["events_per_second"] = events / elapsed
+    results["attendance_log_drain_per_event"]["stats"] = writer.stats()
+
+
+# The whole frame path as the recognizers run it: convert, detect, encode, match, log
+def benchmark_end_to_end(frames, boxes, model, gallery_size, templates_per_person, work_dir, results):
+    gallery = synthetic_gallery(gallery_size, templates_per_person)
+    writer = AttendanceLogWriter(os.path.join(work_dir, "end_to_end.db"))
+    writer.start()
+
+    def process(item):
+        frame, frame_boxes = item
+        rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_recognition.face_locations(rgb_img, model=model)
+        face_encodings = face_recognition.face_encodings(rgb_img, frame_boxes)
+        for name, user_id, _ in identify_faces(gallery, face_encodings, DEFAULT_THRESHOLD):
+            writer.log(name, user_id)
+
+    results[f"end_to_end_{model}_{gallery_size}"] = time_calls(process, list(zip(frames, boxes)))
+    writer.close()
+
+
+# Recorded in the report so results from different machines are not compared blindly
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# Compare median timings against an earlier report, benchmark by benchmark
+# Returns the names of benchmarks that got slower than tolerance allows
+def compare_results(report, baseline_path, tolerance):
+    with open(baseline_path) as file:
+        baseline_report = json.load(file)
+    if baseline_report["environment"] != report["environment"]:
+        print("Warning: the baseline was recorded in a different environment")
+    if baseline_report["settings"] != report["settings"]:
+        print("Warning: the baseline was recorded with different settings")
+    results, baseline = report["results"], baseline_report["results"]
+
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median_ms"], stats["median_ms"]
+        change = after / before - 1.0 if before > 0 else 0.0
+        marker = ""
+        if change > tolerance:
+            marker = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:32s} {before:10.3f} ms -> {after:10.3f} ms ({change:+.1%}){marker}")
+    return regressions
+
+
+def run_benchmarks(args):
+    frames = load_frames(args.frames, args.frame_count)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if not args.skip_frames:
+            _, boxes = benchmark_frame_stages(frames, args.models, results)
+        benchmark_matching(args.gallery_sizes, args.templates, args.match_batches, args.faces_per_frame,
+                           not args.no_ann, results)
+        # Parity is against float64, which is what a float64 recognizer maps (the snapshot's
+        # full-precision companion); float32 galleries are cast from it like the snapshot is
+        for size in args.gallery_sizes:
+            benchmark_precision(synthetic_gallery(size, args.templates, dtype=np.float64), size, args.match_batches,
+                                args.faces_per_frame, args.precisions, args.parity_queries, results)
+        if args.parity_db:
+            benchmark_precision(load_gallery(args.parity_db, dtype=np.float64), "db", args.match_batches,
+                                args.faces_per_frame, args.precisions, args.parity_queries, results)
+        benchmark_logging(work_dir, args.log_events, results)
+        if not args.skip_frames:
+            benchmark_end_to_end(frames, boxes, args.models[0], args.gallery_sizes[0], args.templates,
+                                 work_dir, results)
+
+    return {
+        "version": BENCHMARK_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "settings": {
+            "frames": args.frames or f"{len(frames)} generated {FRAME_SIZE[1]}x{FRAME_SIZE[0]} frames",
+            "models": args.models,
+            "gallery_sizes": args.gallery_sizes,
+            "templates_per_person": args.templates,
+            "faces_per_frame": args.faces_per_frame,
+            "precisions": args.precisions,
+            "parity_queries": args.parity_queries,
+            "parity_db": args.parity_db,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every stage of the recognition pipeline offline.")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report to write")
+    parser.add_argument("--frames", help="directory of test images (default: generated frames)")
+    parser.add_argument("--frame-count", type=int, default=None, help="frames to use (default: all, or 20 generated)")
+    parser.add_argument("--models", nargs="+", choices=["hog", "cnn"], default=["hog"])
+    parser.add_argument("--gallery-sizes", nargs="+", type=int, default=DEFAULT_GALLERY_SIZES,
+                        help="synthetic gallery sizes, e.g. 1000 10000 100000 1000000")
+    parser.add_argument("--templates", type=int, default=1, help="templates per synthetic person")
+    parser.add_argument("--faces-per-frame", type=int, default=4)
+    parser.add_argument("--match-batches", type=int, default=50, help="frames matched per gallery size")
+    parser.add_argument("--log-events", type=int, default=LOG_EVENTS)
+    parser.add_argument("--no-ann", action="store_true", help="skip the approximate index on large galleries")
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS),
+                        help="gallery storage precisions to time and check for parity")
+    parser.add_argument("--parity-queries", type=int, default=PARITY_QUERIES,
+                        help="borderline queries per gallery for the parity check")
+    parser.add_argument("--parity-db", help="also check parity on the templates enrolled in this database")
+    parser.add_argument("--skip-frames", action="store_true", help="only benchmark matching and logging")
+    parser.add_argument("--compare", help="earlier JSON report to compare median timings against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a regression")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(report['results'])} benchmark results to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(report, args.compare, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,212 @@
+import argparse
+import csv
+import os
+import sqlite3
+import time
+from multiprocessing import Pool
+import cv2
+from .face_models import face_recognition
+from .encoding_format import ENCODING_FORMAT_VERSION, encode_encodings
+from .face_db import COMMIT_EVERY, get_connection, transaction
+from .image_store import delete_image, put_image
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+# People from a directory tree: one subdirectory per person named "<id>_<name>"
+# (a directory without "_" uses its name as both), holding that person's photos
+def read_directory(root):
+    people = {}
+    for entry in sorted(os.listdir(root)):
+        person_dir = os.path.join(root, entry)
+        if not os.path.isdir(person_dir):
+            continue
+        user_id, _, name = entry.partition("_")
+        paths = []
+        for dirpath, _, filenames in os.walk(person_dir):
+            paths.extend(os.path.join(dirpath, filename) for filename in sorted(filenames)
+                         if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS)
+        add_person(people, user_id, name or user_id, paths)
+    return people
+
+
+# People from a CSV roster with id,name,image_paths columns; image_paths holds one or more
+# paths separated by ";" and relative paths are resolved against the roster's directory
+def read_roster(csv_path):
+    base = os.path.dirname(os.path.abspath(csv_path))
+    people = {}
+    with open(csv_path, newline="") as file:
+        for row in csv.DictReader(file):
+            paths = [os.path.join(base, path.strip()) for path in row["image_paths"].split(";") if path.strip()]
+            add_person(people, row["id"].strip(), row["name"].strip(), paths)
+    return people
+
+
+# Rows for the same id are merged so each person is one task
+def add_person(people, user_id, name, paths):
+    if user_id in people:
+        people[user_id][1].extend(paths)
+    else:
+        people[user_id] = (name, list(paths))
+
+
+# Worker: encode every photo of one person
+# Returns (user_id, name, encodings, image_key, failures) where failures lists (path, reason)
+# The stored photo is written to the image store here, before its key reaches the database
+def encode_person(person):
+    user_id, name, paths, model, db_path = person
+    encodings = []
+    image_key = None
+    failures = []
+
+    for path in paths:
+        try:
+            rgb_img = face_recognition.load_image_file(path)
+        except (OSError, ValueError) as e:
+            failures.append((path, f"unreadable image: {e}"))
+            continue
+
+        face_locations = face_recognition.face_locations(rgb_img, model=model)
+        if not face_locations:
+            failures.append((path, "no face found"))
+            continue
+        if len(face_locations) > 1:
+            failures.append((path, f"{len(face_locations)} faces found"))
+            continue
+
+        encodings.append(encode_encodings(face_recognition.face_encodings(rgb_img, face_locations)[0]))
+        if image_key is None:
+            # Keep the first usable photo as the person's stored image, as the capture scripts do
+            _, img_encoded = cv2.imencode('.jpg', cv2.cvtColor(rgb_img, cv2.COLOR_RGB2BGR))
+            image_key = put_image(img_encoded.tobytes(), db_path)
+
+    return user_id, name, encodings, image_key, failures
+
+
+# Insert finished people with executemany in a single transaction
+# When one of them conflicts with a row already in the database (e.g. the id is enrolled under
+# another name), the batch is written again person by person, each in its own savepoint, so
+# only the conflicting people are left out. Returns (result, reason) for every person left out.
+def write_people(conn, results):
+    try:
+        with transaction(conn) as cursor:
+            insert_people(cursor, results)
+        return []
+    except sqlite3.IntegrityError:
+        pass
+
+    rejected = []
+    with transaction(conn) as cursor:
+        for result in results:
+            cursor.execute("SAVEPOINT person")
+            try:
+                insert_people(cursor, [result])
+            except sqlite3.IntegrityError as e:
+                cursor.execute("ROLLBACK TO person")
+                rejected.append((result, str(e)))
+            cursor.execute("RELEASE person")
+    return rejected
+
+
+def insert_people(cursor, results):
+    faces_rows = [(user_id, name, image_key) for user_id, name, _, image_key, _ in results]
+    template_rows = [(user_id, encoding_blob, ENCODING_FORMAT_VERSION)
+                     for user_id, _, encodings, _, _ in results for encoding_blob in encodings]
+    cursor.executemany("INSERT INTO faces (id, name, image_key) VALUES (?, ?, ?)", faces_rows)
+    cursor.executemany("INSERT INTO face_templates (user_id, encoding, encoding_format) VALUES (?, ?, ?)",
+                       template_rows)
+
+
+# The workers store photos before the rows exist; remove the photo of a person who was left out,
+# unless an enrolled row uses the same image
+def discard_image(conn, image_key, db_path):
+    if image_key is None:
+        return
+    if conn.execute("SELECT 1 FROM faces WHERE image_key = ? LIMIT 1", (image_key,)).fetchone() is None:
+        delete_image(image_key, db_path)
+
+
+# Enroll everyone in people ({user_id: (name, paths)}) that is not in the database yet
+# Re-running after an interruption skips the people already written and carries on
+def bulk_enroll(people, db_path="face_data.db", workers=None, model="hog", commit_every=COMMIT_EVERY,
+                failures_path=None):
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id FROM faces")
+    enrolled = {row[0] for row in cursor.fetchall()}
+    todo = [(user_id, name, paths, model, db_path) for user_id, (name, paths) in people.items() if user_id not in enrolled]
+    print(f"{len(people)} people in the input, {len(people) - len(todo)} already enrolled, {len(todo)} to enroll")
+
+    started = time.monotonic()
+    pending = []
+    enrolled_count = 0
+    template_count = 0
+    failed_people = []
+    image_failures = []  # Rows of the failure report: skipped photos and people the database rejected
+    rejected_count = 0
+
+    # Write pending people; those the database rejects go to the failure report like skipped photos
+    def write_pending():
+        nonlocal enrolled_count, template_count, rejected_count
+        rejected = write_people(conn, pending)
+        rejected_count += len(rejected)
+        for (user_id, name, _, image_key, _), reason in rejected:
+            print(f"Error: Could not enroll {name} (ID: {user_id}): {reason}")
+            image_failures.append((user_id, name, "", f"not enrolled: {reason}"))
+            failed_people.append(user_id)
+            discard_image(conn, image_key, db_path)
+        rejected_ids = {result[0] for result, _ in rejected}
+        written = [result for result in pending if result[0] not in rejected_ids]
+        enrolled_count += len(written)
+        template_count += sum(len(r[2]) for r in written)
+
+    with Pool(workers) as pool:
+        for result in pool.imap_unordered(encode_person, todo, chunksize=4):
+            user_id, name, encodings, _, failures = result
+            for path, reason in failures:
+                print(f"Skipped {path} ({name}, ID: {user_id}): {reason}")
+                image_failures.append((user_id, name, path, reason))
+
+            if not encodings:
+                print(f"Error: No usable photo for {name} (ID: {user_id}). Not enrolled.")
+                failed_people.append(user_id)
+                continue
+
+            pending.append(result)
+            if commit_every and len(pending) >= commit_every:
+                write_pending()
+                pending = []
+                print(f"Enrolled {enrolled_count}/{len(todo)} people")
+
+        if pending:
+            write_pending()
+
+    if failures_path and image_failures:
+        with open(failures_path, mode="w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["id", "name", "path", "reason"])
+            writer.writerows(image_failures)
+
+    elapsed = time.monotonic() - started
+    skipped_photos = len(image_failures) - rejected_count
+    print(f"Enrolled {enrolled_count} people with {template_count} templates in {elapsed:.1f}s; "
+          f"{skipped_photos} photos skipped, {len(failed_people)} people not enrolled")
+    return {"enrolled": enrolled_count, "templates": template_count,
+            "skipped_photos": skipped_photos, "failed_people": failed_people}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enroll people from a directory tree or a CSV roster.")
+    parser.add_argument("source", help="directory with one <id>_<name> folder per person, or a CSV roster "
+                                       "with id,name,image_paths columns")
+    parser.add_argument("--db", default="face_data.db")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument("--model", choices=["hog", "cnn"], default="hog")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY,
+                        help="people per transaction; 0 writes everything in one transaction at the end")
+    parser.add_argument("--failures", default="enroll_failures.csv", help="CSV report of skipped photos")
+    args = parser.parse_args()
+
+    people = read_directory(args.source) if os.path.isdir(args.source) else read_roster(args.source)
+    bulk_enroll(people, args.db, args.workers, args.model, args.commit_every, args.failures)
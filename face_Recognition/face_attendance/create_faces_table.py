@@ -0,0 +1,7 @@
+from .face_db import init_db
+
+# Create the database, or upgrade an existing one, to the current schema
+# The schema and its migrations live in face_db.py; databases made by older versions of
+# this script (INTEGER ids and a timestamp column) are converted to the shared TEXT-id layout
+if __name__ == "__main__":
+    init_db("face_data.db")
@@ -0,0 +1,58 @@
+import cv2
+from .face_models import face_recognition
+from .face_matcher import identify_faces
+from .gallery_snapshot import open_gallery
+
+def load_face_data_from_db():
+    # Open the memory-mapped gallery snapshot, rebuilding it only if the faces table changed
+    return open_gallery("face_data.db")
+
+def recognize_face():
+    # Load the existing face encodings and names from the database
+    gallery = load_face_data_from_db()
+
+    # Open the webcam
+    cam = cv2.VideoCapture(0)
+
+    # Check if the webcam is opened correctly
+    if not cam.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+
+    cv2.namedWindow("Face Recognition")
+
+    while True:
+        ret, frame = cam.read()
+        if not ret:
+            print("Failed to grab frame. Exiting...")
+            break
+
+        # Convert the image from BGR to RGB (for face recognition)
+        rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # Find all faces and their encodings in the current frame
+        face_locations = face_recognition.face_locations(rgb_img)
+        face_encodings = face_recognition.face_encodings(rgb_img, face_locations)
+
+        # Compare every face in the frame against the whole gallery in one batch
+        matches = identify_faces(gallery, face_encodings)
+
+        for (top, right, bottom, left), (name, user_id, distance) in zip(face_locations, matches):
+            # Draw a rectangle around the face and put the name label
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+        # Display the frame
+        cv2.imshow("Face Recognition", frame)
+
+        # Wait for ESC key to exit the loop
+        if cv2.waitKey(1) % 256 == 27:  # ESC key
+            break
+
+    # Release resources
+    cam.release()
+    cv2.destroyAllWindows()
+
+# Run the face recognition function
+if __name__ == "__main__":
+    recognize_face()
@@ -0,0 +1,78 @@
+import cv2
+from .face_models import face_recognition
+from .attendance_log import AttendanceLogWriter
+from .face_matcher import identify_faces
+from .gallery_snapshot import open_gallery
+
+def load_face_data_from_db():
+    # Open the memory-mapped gallery snapshot, rebuilding it only if the faces table changed
+    return open_gallery("face_data.db")
+
+def recognize_and_log_face():
+    # Load the existing face encodings, names, and IDs from the database
+    gallery = load_face_data_from_db()
+
+    # Open the webcam
+    cam = cv2.VideoCapture(0)
+
+    # Check if the webcam is opened correctly
+    if not cam.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+
+    # Recognitions are queued and written in batches on a background thread
+    attendance_log = AttendanceLogWriter("face_data.db", csv_path="recognition_log.csv")
+    attendance_log.start()
+
+    cv2.namedWindow("Face Recognition")
+    recognized = False  # Flag to ensure only one entry is made
+
+    while True:
+        ret, frame = cam.read()
+        if not ret:
+            print("Failed to grab frame. Exiting...")
+            break
+
+        # Convert the image from BGR to RGB (for face recognition)
+        rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # Find all faces and their encodings in the current frame
+        face_locations = face_recognition.face_locations(rgb_img)
+        face_encodings = face_recognition.face_encodings(rgb_img, face_locations)
+
+        # Compare every face in the frame against the whole gallery in one batch
+        matches = identify_faces(gallery, face_encodings)
+
+        for (top, right, bottom, left), (name, user_id, distance) in zip(face_locations, matches):
+            if user_id is not None:
+                # Draw a rectangle around the face and put the name label
+                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+                # Only log the recognition once, when the user presses a specific key (e.g., spacebar)
+                if not recognized:
+                    attendance_log.log(name, user_id)
+                    recognized = True  # Mark as recognized, so no further entries are made
+
+        # Display the frame
+        cv2.imshow("Face Recognition", frame)
+
+        # Wait for ESC key to exit the loop or spacebar to log once
+        key = cv2.waitKey(1) % 256
+        if key == 27:  # ESC key
+            break
+        if key == 32:  # Spacebar to make the entry
+            if recognized:
+                print("Recognition logged.")
+                break
+
+    # Write any queued attendance events before exiting
+    attendance_log.close()
+
+    # Release resources
+    cam.release()
+    cv2.destroyAllWindows()
+
+# Run the face recognition and logging function
+if __name__ == "__main__":
+    recognize_and_log_face()
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+from .face_models import face_recognition
+
+HASH_SIZE = 8  # dHash grid: 8x8 bits from a 9x8 grayscale thumbnail
+MAX_HAMMING = 4  # Differing hash bits (of 64) still treated as the same crop
+MAX_SHIFT = 0.08  # Box center movement allowed, as a fraction of the box size
+MAX_RESIZE = 0.08  # Relative change in box size allowed
+CACHE_TTL = 5.0  # Seconds a cached encoding is reused before the face is encoded again
+MAX_ENTRIES = 128
+
+
+# Difference hash of a face crop: resize to (HASH_SIZE + 1) x HASH_SIZE grayscale and set
+# one bit per horizontally adjacent pair that gets brighter. Robust to small noise and
+# global brightness changes, and costs a few microseconds per face.
+def crop_fingerprint(rgb_img, box):
+    top, right, bottom, left = box
+    crop = rgb_img[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)]
+    if crop.size == 0:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class CacheEntry:
+    def __init__(self, fingerprint, box, encoding, now):
+        self.fingerprint = fingerprint
+        self.box = box
+        self.encoding = encoding
+        self.created_at = now
+        self.last_seen = now
+
+
+# Bounded LRU cache in front of face_recognition.face_encodings for static cameras
+# A face whose crop fingerprint is within max_hamming bits of a cached one, and whose box
+# has moved and resized by less than max_shift / max_resize, reuses the cached 128-d vector
+# instead of re-running landmark alignment and the ResNet embedding. Entries are re-encoded
+# after ttl seconds and dropped least recently used first beyond max_entries.
+class EncodingCache:
+    def __init__(self, max_hamming=MAX_HAMMING, max_shift=MAX_SHIFT, max_resize=MAX_RESIZE, ttl=CACHE_TTL,
+                 max_entries=MAX_ENTRIES):
+        self.max_hamming = max_hamming
+        self.max_shift = max_shift
+        self.max_resize = max_resize
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.next_key = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Same geometry within tolerance: centers close relative to the box size, and similar size
+    def same_place(self, a, b):
+        a_height, a_width = a[2] - a[0], a[1] - a[3]
+        b_height, b_width = b[2] - b[0], b[1] - b[3]
+        size = max(a_height, a_width, 1)
+        if abs((a[0] + a[2]) - (b[0] + b[2])) / 2 > self.max_shift * size:
+            return False
+        if abs((a[1] + a[3]) - (b[1] + b[3])) / 2 > self.max_shift * size:
+            return False
+        return abs(a_height - b_height) <= self.max_resize * size and abs(a_width - b_width) <= self.max_resize * size
+
+    # Cached encoding for a crop, or None; called with the lock held
+    def lookup(self, fingerprint, box, now):
+        for key, entry in self.entries.items():
+            if (bin(entry.fingerprint ^ fingerprint).count("1") <= self.max_hamming
+                    and self.same_place(entry.box, box)):
+                if now - entry.created_at >= self.ttl:
+                    del self.entries[key]
+                    self.evictions += 1
+                    return None
+                entry.last_seen = now
+                self.entries.move_to_end(key)
+                return entry.encoding
+        return None
+
+    # Drop entries not seen for ttl seconds; they are at the front in LRU order. Called with the lock held
+    def expire(self, now):
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if now - entry.last_seen < self.ttl:
+                break
+            del self.entries[key]
+            self.evictions += 1
+
+    # Drop-in for face_recognition.face_encodings(rgb_img, boxes): only faces whose crop
+    # changed materially are encoded, all in one call
+    def face_encodings(self, rgb_img, boxes, now=None):
+        now = time.monotonic() if now is None else now
+        fingerprints = [crop_fingerprint(rgb_img, box) for box in boxes]
+        encodings = [None] * len(boxes)
+
+        with self.lock:
+            self.expire(now)
+            for i, (fingerprint, box) in enumerate(zip(fingerprints, boxes)):
+                if fingerprint is not None:
+                    encodings[i] = self.lookup(fingerprint, box, now)
+            missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+            self.hits += len(boxes) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            for i, encoding in zip(missing, face_recognition.face_encodings(rgb_img, [boxes[i] for i in missing])):
+                encodings[i] = encoding
+
+            with self.lock:
+                for i in missing:
+                    if fingerprints[i] is None:
+                        continue
+                    self.entries[self.next_key] = CacheEntry(fingerprints[i], boxes[i], encodings[i], now)
+                    self.next_key += 1
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                        self.evictions += 1
+
+        return encodings
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,64 @@
+import numpy as np
+
+# Raw encoding format stored in face_templates.encoding
+#
+# Version 1 (encoding_format = 1):
+#   The BLOB is one or more 128-wide face encodings of little-endian float64
+#   ('<f8') packed back to back with no header or padding. A BLOB holding n
+#   samples is exactly n * 1024 bytes and is read with np.frombuffer.
+#   face_templates stores one template (one vector) per row, linked to its
+#   identity in faces by user_id.
+#
+# Encodings still stored in faces.encoding are the old layout: pickled BLOBs
+# (encoding_format NULL) or version 1 BLOBs holding every sample of a person.
+# They are never unpickled at load time; move them into face_templates once
+# with migrate_encodings.py.
+ENCODING_FORMAT_VERSION = 1
+ENCODING_SIZE = 128
+ENCODING_DTYPE = np.dtype("<f8")
+ENCODING_BYTES = ENCODING_SIZE * ENCODING_DTYPE.itemsize
+
+
+# Add the encoding_format column to a faces table created before it existed
+def add_encoding_format_column(cursor):
+    cursor.execute("PRAGMA table_info(faces)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if "encoding_format" not in columns:
+        cursor.execute("ALTER TABLE faces ADD COLUMN encoding_format INTEGER")
+
+
+# Create the per-template table, and upgrade faces tables created before the format column existed
+def create_face_templates_table(cursor):
+    add_encoding_format_column(cursor)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS face_templates (
+                        template_id INTEGER PRIMARY KEY,
+                        user_id TEXT NOT NULL REFERENCES faces(id),
+                        encoding BLOB NOT NULL,
+                        encoding_format INTEGER NOT NULL)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS face_templates_user_id ON face_templates(user_id)")
+
+
+# Serialize one encoding (128,) or several samples (n, 128) into a version 1 BLOB
+def encode_encodings(encodings):
+    samples = np.asarray(encodings, dtype=ENCODING_DTYPE)
+    if samples.size == 0 or samples.size % ENCODING_SIZE != 0:
+        raise ValueError(f"Expected 128-wide encodings, got shape {samples.shape}")
+    return samples.reshape(-1, ENCODING_SIZE).tobytes()
+
+
+# Deserialize a single version 1 BLOB into an (n, 128) array without copying
+def decode_encodings(blob):
+    if len(blob) == 0 or len(blob) % ENCODING_BYTES != 0:
+        raise ValueError(f"Encoding BLOB of {len(blob)} bytes is not a whole number of 128-d vectors")
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+
+
+# Deserialize many version 1 BLOBs in one frombuffer call
+# Returns the stacked (total, 128) matrix and the number of samples in each BLOB
+def decode_many(blobs):
+    sizes = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+    if np.any(sizes == 0) or np.any(sizes % ENCODING_BYTES != 0):
+        raise ValueError("Encoding BLOB is not a whole number of 128-d vectors")
+
+    matrix = np.frombuffer(b"".join(blobs), dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+    return matrix, sizes // ENCODING_BYTES
@@ -0,0 +1,214 @@
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from .encoding_format import add_encoding_format_column, create_face_templates_table
+
+DEFAULT_DB_PATH = "face_data.db"
+BUSY_TIMEOUT = 10.0  # Seconds to wait for another writer instead of failing with "database is locked"
+STATEMENT_CACHE_SIZE = 256  # Compiled statements kept per connection and reused for identical SQL
+COMMIT_EVERY = 250  # People bulk_enroll.py writes per transaction; an interrupted run loses at most this much work
+
+# Applied to every connection
+# WAL lets readers and one writer work at the same time without blocking each other;
+# synchronous=NORMAL is durable across application crashes in WAL mode and avoids an fsync per commit
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16384",  # 16 MiB page cache
+    "PRAGMA mmap_size=268435456",  # Read pages through a 256 MiB memory map
+)
+
+
+# Add the image_key column (see image_store.py) to a faces table created before it existed
+# Kept here rather than in image_store.py, which imports OpenCV, so opening the database does not
+def add_image_key_column(cursor):
+    cursor.execute("PRAGMA table_info(faces)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if "image_key" not in columns:
+        cursor.execute("ALTER TABLE faces ADD COLUMN image_key TEXT")
+
+
+# Schema migrations, applied in order; PRAGMA user_version records how many have run
+# Version 1: the faces table every script used to create, with face_templates, encoding_format and image_key
+def migrate_base_schema(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS faces (
+                        id TEXT PRIMARY KEY,
+                        name TEXT,
+                        encoding BLOB,
+                        image BLOB,
+                        encoding_format INTEGER,
+                        image_key TEXT)''')
+    add_encoding_format_column(cursor)
+    create_face_templates_table(cursor)
+    add_image_key_column(cursor)
+
+
+# Version 2: attendance events written by attendance_log.py
+def migrate_attendance_table(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS attendance (
+                        event_id INTEGER PRIMARY KEY,
+                        user_id TEXT,
+                        name TEXT,
+                        recognized_at TEXT NOT NULL)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS attendance_user_time ON attendance (user_id, recognized_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS attendance_time ON attendance (recognized_at)")
+
+
+# Version 3: one faces schema for every database
+# create_faces_table.py made id INTEGER with a timestamp column, the scripts made id TEXT
+# without one. Both become id TEXT with created_at; rowids and template ids are kept so
+# image migrations and gallery snapshots still line up.
+def migrate_unify_faces(cursor):
+    cursor.execute("PRAGMA table_info(faces)")
+    columns = {row[1] for row in cursor.fetchall()}
+    created_at = "timestamp" if "timestamp" in columns else "NULL"
+
+    cursor.execute('''CREATE TABLE face_templates_new (
+                        template_id INTEGER PRIMARY KEY,
+                        user_id TEXT NOT NULL REFERENCES faces(id),
+                        encoding BLOB NOT NULL,
+                        encoding_format INTEGER NOT NULL)''')
+    cursor.execute('''INSERT INTO face_templates_new (template_id, user_id, encoding, encoding_format)
+                      SELECT template_id, CAST(user_id AS TEXT), encoding, encoding_format FROM face_templates''')
+    cursor.execute("DROP TABLE face_templates")
+    cursor.execute("ALTER TABLE face_templates_new RENAME TO face_templates")
+    cursor.execute("CREATE INDEX IF NOT EXISTS face_templates_user_id ON face_templates(user_id)")
+
+    cursor.execute('''CREATE TABLE faces_new (
+                        id TEXT PRIMARY KEY,
+                        name TEXT,
+                        encoding BLOB,
+                        image BLOB,
+                        encoding_format INTEGER,
+                        image_key TEXT,
+                        created_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
+    cursor.execute(f'''INSERT INTO faces_new (rowid, id, name, encoding, image, encoding_format, image_key, created_at)
+                       SELECT rowid, CAST(id AS TEXT), name, encoding, image, encoding_format, image_key, {created_at}
+                       FROM faces''')
+    cursor.execute("DROP TABLE faces")
+    cursor.execute("ALTER TABLE faces_new RENAME TO faces")
+
+
+# Version 4: change log for live gallery reloads (gallery_reload.py)
+# Triggers record every template added or removed and every identity added, renamed or
+# deleted, so a running recognizer can merge just those rows. A template update is logged
+# as its removal plus its insertion.
+def migrate_gallery_changes(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS gallery_changes (
+                        change_id INTEGER PRIMARY KEY,
+                        template_id INTEGER,
+                        user_id TEXT,
+                        change TEXT NOT NULL)''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS face_templates_logged_insert AFTER INSERT ON face_templates BEGIN
+                        INSERT INTO gallery_changes (template_id, user_id, change) VALUES (NEW.template_id, NEW.user_id, 'insert');
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS face_templates_logged_delete AFTER DELETE ON face_templates BEGIN
+                        INSERT INTO gallery_changes (template_id, user_id, change) VALUES (OLD.template_id, OLD.user_id, 'delete');
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS face_templates_logged_update AFTER UPDATE ON face_templates BEGIN
+                        INSERT INTO gallery_changes (template_id, user_id, change) VALUES (OLD.template_id, OLD.user_id, 'delete');
+                        INSERT INTO gallery_changes (template_id, user_id, change) VALUES (NEW.template_id, NEW.user_id, 'insert');
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS faces_logged_insert AFTER INSERT ON faces BEGIN
+                        INSERT INTO gallery_changes (user_id, change) VALUES (NEW.id, 'identity');
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS faces_logged_update AFTER UPDATE OF id, name ON faces BEGIN
+                        INSERT INTO gallery_changes (user_id, change) VALUES (OLD.id, 'identity');
+                        INSERT INTO gallery_changes (user_id, change) VALUES (NEW.id, 'identity');
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS faces_logged_delete AFTER DELETE ON faces BEGIN
+                        INSERT INTO gallery_changes (user_id, change) VALUES (OLD.id, 'identity');
+                      END''')
+
+
+MIGRATIONS = [migrate_base_schema, migrate_attendance_table, migrate_unify_faces, migrate_gallery_changes]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+thread_state = threading.local()
+
+
+# Bring the schema up to SCHEMA_VERSION
+# The version is re-read inside a write transaction, so concurrent processes migrate once
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        cursor = conn.cursor()
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            print(f"Database schema migrated to version {number} ({migration.__name__})")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return SCHEMA_VERSION
+
+
+# New connection with the standard pragmas and any pending migrations applied
+# The schema version is checked on every connection rather than remembered per path: each
+# ":memory:" connection is a new empty database, and a file can be replaced while we run.
+# Prefer get_connection() unless the connection must be private.
+def connect(db_path=DEFAULT_DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    migrate(conn)
+    return conn
+
+
+# Persistent connection for the calling thread, opened on first use
+# SQLite connections must not be shared between threads or survive a fork, so each
+# thread of each process gets its own; repeated queries on it reuse compiled statements.
+def get_connection(db_path=DEFAULT_DB_PATH):
+    if getattr(thread_state, "pid", None) != os.getpid():
+        thread_state.pid = os.getpid()
+        thread_state.connections = {}
+
+    key = os.path.abspath(db_path)
+    conn = thread_state.connections.get(key)
+    if conn is None:
+        conn = connect(db_path)
+        thread_state.connections[key] = conn
+    return conn
+
+
+# Close the calling thread's persistent connection, if it has one
+def close_connection(db_path=DEFAULT_DB_PATH):
+    if getattr(thread_state, "pid", None) != os.getpid():
+        return
+    conn = thread_state.connections.pop(os.path.abspath(db_path), None)
+    if conn is not None:
+        conn.close()
+
+
+# Write transaction that takes the write lock up front
+# A deferred transaction that reads first can fail to upgrade when another connection
+# wrote in between; BEGIN IMMEDIATE waits for the lock (up to BUSY_TIMEOUT) instead.
+@contextmanager
+def transaction(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# Create or upgrade the database schema
+def init_db(db_path=DEFAULT_DB_PATH):
+    conn = get_connection(db_path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    print(f"{db_path} is at schema version {version}")
+    return version
+
+if __name__ == "__main__":
+    init_db(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
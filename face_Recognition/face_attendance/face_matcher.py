@@ -0,0 +1,219 @@
+import numpy as np
+from .encoding_format import ENCODING_SIZE, ENCODING_FORMAT_VERSION, decode_many
+from .face_db import get_connection
+
+DEFAULT_THRESHOLD = 0.6  # Same tolerance face_recognition.compare_faces uses
+DEFAULT_REDUCTION = "min"  # How template distances combine into one identity distance: "min" or "mean"
+
+# Float types the gallery matrix can be stored in. dlib returns float64, but float32 halves the
+# memory and the bytes every match reads. Its distance error is about 1e-6 near the threshold
+# and grows to about 1e-3 for near-identical vectors, where |a|^2 + |b|^2 - 2 a.b cancels before
+# the square root; neither moves a face across the threshold. benchmark.py measures this
+# (match_<precision> parity).
+GALLERY_DTYPES = {"float64": np.float64, "float32": np.float32}
+DEFAULT_PRECISION = "float32"
+DEFAULT_DTYPE = GALLERY_DTYPES[DEFAULT_PRECISION]
+
+
+# In-memory gallery: one contiguous matrix of templates with parallel id/name arrays
+# Several templates can belong to one identity; they are grouped once here so matching
+# can reduce template distances per identity with reduceat instead of a Python loop
+class Gallery:
+    # build_id identifies the row order, so indexes built over one snapshot are not reused on another
+    # rowids holds the face_templates rowid of every row, so live reloads can find rows to replace
+    # encodings are stored as dtype; an array that already has it (e.g. a mapped snapshot) is not copied
+    # last_change is the gallery_changes position the rows reflect, where live reloads start merging
+    def __init__(self, encodings, ids, names, sq_norms=None, build_id=None, rowids=None, dtype=DEFAULT_DTYPE,
+                 last_change=None):
+        self.encodings = np.ascontiguousarray(encodings, dtype=dtype).reshape(-1, ENCODING_SIZE)
+        self.ids = np.asarray(ids, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.rowids = None if rowids is None else np.asarray(rowids, dtype=np.int64)
+
+        # Squared norms are reused for every frame, so compute them once
+        if sq_norms is None:
+            sq_norms = squared_norms(self.encodings)
+        self.sq_norms = sq_norms
+        self.build_id = build_id
+        self.last_change = last_change
+
+        # Identity of every template, plus a CSR-style grouping of templates by identity:
+        # the templates of identity i are group_order[group_starts[i]:group_starts[i] + group_counts[i]]
+        if len(self.ids):
+            self.identity_ids, first_template, self.template_identity = np.unique(
+                self.ids, return_index=True, return_inverse=True)
+            self.identity_names = self.names[first_template]
+        else:
+            self.identity_ids = np.array([], dtype=object)
+            self.identity_names = np.array([], dtype=object)
+            self.template_identity = np.array([], dtype=np.int64)
+        self.group_order = np.argsort(self.template_identity, kind="stable")
+        self.group_counts = np.bincount(self.template_identity, minlength=len(self.identity_ids))
+        self.group_starts = np.concatenate([[0], np.cumsum(self.group_counts)[:-1]]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.encodings)
+
+
+# Float type stored for a precision; the compressed ones ("int8", "pq") keep float32 rows for re-ranking
+def storage_dtype(precision=DEFAULT_PRECISION):
+    return GALLERY_DTYPES.get(precision, np.float32)
+
+
+# Squared norm of every row, accumulated in float64 whatever the rows are stored as
+def squared_norms(matrix):
+    return np.einsum("ij,ij->i", matrix, matrix, dtype=np.float64)
+
+
+# Read templates with rowid greater than after_rowid, joined to their identity's name
+# Returns (max_rowid, matrix, ids, names, rowids) with one matrix row per template
+def read_gallery_rows(cursor, after_rowid=0):
+    cursor.execute('''SELECT t.rowid, t.user_id, f.name, t.encoding
+                      FROM face_templates t JOIN faces f ON f.id = t.user_id
+                      WHERE t.encoding_format = ? AND t.rowid > ? ORDER BY t.rowid''',
+                   (ENCODING_FORMAT_VERSION, after_rowid))
+    records = cursor.fetchall()
+    max_rowid = records[-1][0] if records else after_rowid
+    return (max_rowid,) + decode_gallery_records(records)
+
+
+# Turn (rowid, user_id, name, encoding) records into (matrix, ids, names, rowids)
+def decode_gallery_records(records):
+    if not records:
+        empty = np.array([], dtype=object)
+        return np.empty((0, ENCODING_SIZE)), empty, empty, np.array([], dtype=np.int64)
+
+    rowids, ids, names, blobs = zip(*records)
+    matrix, counts = decode_many(blobs)
+
+    # A template BLOB normally holds one vector; repeat the id/name if it holds more
+    ids = np.repeat(np.array(ids, dtype=object), counts)
+    names = np.repeat(np.array(names, dtype=object), counts)
+    rowids = np.repeat(np.array(rowids, dtype=np.int64), counts)
+    return matrix, ids, names, rowids
+
+
+# Encodings still stored on faces rows are skipped rather than decoded at startup, so say so
+def warn_about_legacy_rows(cursor):
+    cursor.execute("SELECT COUNT(*) FROM faces WHERE encoding IS NOT NULL")
+    legacy_count = cursor.fetchone()[0]
+    if legacy_count:
+        print(f"Warning: skipped {legacy_count} face encodings stored in the old layout. "
+              "Run python -m face_attendance.migrate_encodings to convert them.")
+
+
+# Load every template into a Gallery in one pass
+def load_gallery(db_path="face_data.db", dtype=DEFAULT_DTYPE):
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
+
+    # Log position first: a change committed while the rows are read is merged again harmlessly
+    cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM gallery_changes")
+    last_change = cursor.fetchone()[0]
+    _, matrix, ids, names, rowids = read_gallery_rows(cursor)
+    warn_about_legacy_rows(cursor)
+
+    return Gallery(matrix, ids, names, rowids=rowids, dtype=dtype, last_change=last_change)
+
+
+# Euclidean distance from every face to every gallery template, shape (faces, templates)
+def distance_matrix(gallery, face_encodings):
+    faces = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+
+    # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, done as one matrix multiply for the whole frame
+    # in the gallery's own precision, so a float32 gallery is never converted; the gallery is
+    # the left operand because BLAS streams a tall row-major matrix fastest that way
+    sq_dist = squared_norms(faces)[:, None] + gallery.sq_norms[None, :]
+    sq_dist -= 2.0 * (gallery.encodings @ faces.astype(gallery.encodings.dtype).T).T
+    np.maximum(sq_dist, 0.0, out=sq_dist)
+    return np.sqrt(sq_dist, out=sq_dist)
+
+
+# Combine columns of consecutive groups with one reduceat call: min or mean per group
+def reduce_groups(grouped, starts, counts, reduce=DEFAULT_REDUCTION):
+    if reduce == "min":
+        return np.minimum.reduceat(grouped, starts, axis=1)
+    if reduce == "mean":
+        return np.add.reduceat(grouped, starts, axis=1) / counts[None, :]
+    raise ValueError(f"Unknown template reduction {reduce!r}, expected 'min' or 'mean'")
+
+
+# Reduce a (faces, templates) distance matrix to (faces, identities)
+def identity_distances(gallery, distances, reduce=DEFAULT_REDUCTION):
+    return reduce_groups(distances[:, gallery.group_order], gallery.group_starts, gallery.group_counts, reduce)
+
+
+# Exact distance from one face to a subset of identities, using all of their templates
+def score_identities(gallery, face_encoding, identities, reduce=DEFAULT_REDUCTION):
+    counts = gallery.group_counts[identities]
+    templates = np.concatenate([gallery.group_order[gallery.group_starts[i]:gallery.group_starts[i] + gallery.group_counts[i]]
+                                for i in identities])
+
+    face = np.asarray(face_encoding, dtype=np.float64).reshape(ENCODING_SIZE)
+    sq_dist = gallery.sq_norms[templates] + face @ face - 2.0 * (gallery.encodings[templates] @ face)
+    distances = np.sqrt(np.maximum(sq_dist, 0.0))[None, :]
+
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    return reduce_groups(distances, starts, counts, reduce)[0]
+
+
+# Column indices and values of the k smallest entries in each row, closest first
+def smallest_k(distances, k):
+    k = min(k, distances.shape[1])
+
+    # argpartition finds the k smallest without sorting the whole row
+    if k < distances.shape[1]:
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    top_distances = np.take_along_axis(distances, top, axis=1)
+    order = np.argsort(top_distances, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_distances, order, axis=1)
+
+
+# Turn identity indices and their distances into (user_id, name, distance) tuples
+def identity_matches(gallery, identities, distances):
+    return [(gallery.identity_ids[i], gallery.identity_names[i], float(d)) for i, d in zip(identities, distances)]
+
+
+# Exact top-k identities for one face among the identities of candidate templates (closest first)
+# Approximate searches use this: the first max_identities identities the candidates name are
+# re-scored over all of their templates with the float distance
+def rerank_candidates(gallery, face_encoding, ranked_templates, k, max_identities, reduce=DEFAULT_REDUCTION):
+    identities, first_seen = np.unique(gallery.template_identity[ranked_templates], return_index=True)
+    identities = identities[np.argsort(first_seen)][:max(k, max_identities)]
+
+    distances = score_identities(gallery, face_encoding, identities, reduce)[None, :]
+    top, top_distances = smallest_k(distances, k)
+    return identity_matches(gallery, identities[top[0]], top_distances[0])
+
+
+# Top-k identities for every face in a frame
+# Returns one list per face of (user_id, name, distance), closest first
+# Template distances are reduced per identity with reduce ("min" or "mean")
+# Pass an ann_index.IVFIndex or a quantized_index index to search approximately; without one the search is exact
+def match_faces(gallery, face_encodings, k=1, index=None, reduce=DEFAULT_REDUCTION):
+    if len(face_encodings) == 0:
+        return []
+    if len(gallery) == 0:
+        return [[] for _ in face_encodings]
+    if index is not None:
+        return index.search(gallery, face_encodings, k, reduce=reduce)
+
+    distances = identity_distances(gallery, distance_matrix(gallery, face_encodings), reduce)
+    top, top_distances = smallest_k(distances, k)
+    return [identity_matches(gallery, row, row_distances) for row, row_distances in zip(top, top_distances)]
+
+
+# Best match for every face in a frame, or ("Unknown", None) when nothing is within the threshold
+# Returns one (name, user_id, distance) tuple per face
+def identify_faces(gallery, face_encodings, threshold=DEFAULT_THRESHOLD, index=None, reduce=DEFAULT_REDUCTION):
+    results = []
+    for matches in match_faces(gallery, face_encodings, k=1, index=index, reduce=reduce):
+        if matches and matches[0][2] < threshold:
+            user_id, name, distance = matches[0]
+            results.append((name, user_id, distance))
+        else:
+            distance = matches[0][2] if matches else None
+            results.append(("Unknown", None, distance))
+    return results
@@ -0,0 +1,42 @@
+import importlib
+import threading
+import time
+import numpy as np
+
+
+# Stand-in for a module that is imported on first attribute access
+# `import face_recognition` loads dlib and all of its models, which takes seconds; modules
+# import this proxy instead, so commands that never detect or encode a face never pay for it.
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self._module or self._load(), attribute)
+
+
+face_recognition = LazyModule("face_recognition")
+
+
+# Load the models and run each network once, so the first real frame is not slowed down
+# by model loading and first-call setup. Returns the seconds it took.
+def warm_up(model="hog"):
+    started = time.perf_counter()
+    frame = np.zeros((160, 160, 3), dtype=np.uint8)
+    face_recognition.face_locations(frame, model=model)
+    face_recognition.face_encodings(frame, [(40, 120, 120, 40)])
+    elapsed = time.perf_counter() - started
+    print(f"Face models ready in {elapsed:.1f}s")
+    return elapsed
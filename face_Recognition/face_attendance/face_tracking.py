@@ -0,0 +1,156 @@
+import itertools
+import cv2
+import numpy as np
+from .face_models import face_recognition
+
+DETECTION_SCALE = 0.25  # Detect on a quarter-size frame, as in face_recognition's webcam demo
+DETECT_EVERY = 5  # Full detection every N frames; tracked boxes are used in between
+IOU_MATCH_THRESHOLD = 0.3  # Minimum overlap for a detection to continue an existing track
+MIN_TRACKED_POINTS = 6  # A track with fewer surviving optical-flow points is considered lost
+MIN_CROP_SIDE = 160  # Smallest side a candidate-region crop is downscaled to
+DUPLICATE_IOU = 0.5  # Boxes from overlapping regions that overlap this much are the same face
+
+
+# Run face_locations on a downscaled copy of an RGB frame and map the boxes back
+# to full-resolution (top, right, bottom, left) coordinates
+# With regions, only those (top, right, bottom, left) crops of the frame are searched
+def detect_faces_scaled(rgb_img, scale=DETECTION_SCALE, model="hog", regions=None):
+    if regions is None:
+        height, width = rgb_img.shape[:2]
+        regions = [(0, width, height, 0)]
+
+    boxes = []
+    for region_top, region_right, region_bottom, region_left in regions:
+        crop = rgb_img[region_top:region_bottom, region_left:region_right]
+        if crop.size == 0:
+            continue
+
+        # Small crops are not shrunk below MIN_CROP_SIDE, or faces in them become too small for HOG
+        crop_scale = min(1.0, max(scale, MIN_CROP_SIDE / min(crop.shape[:2])))
+        if crop_scale < 1:
+            crop = cv2.resize(crop, (0, 0), fx=crop_scale, fy=crop_scale, interpolation=cv2.INTER_AREA)
+
+        for top, right, bottom, left in face_recognition.face_locations(crop, model=model):
+            box = (region_top + int(round(top / crop_scale)), region_left + int(round(right / crop_scale)),
+                   region_top + int(round(bottom / crop_scale)), region_left + int(round(left / crop_scale)))
+            box = (max(region_top, box[0]), min(region_right, box[1]), min(region_bottom, box[2]), max(region_left, box[3]))
+
+            # Overlapping regions can find the same face twice
+            if all(iou(box, other) < DUPLICATE_IOU for other in boxes):
+                boxes.append(box)
+    return boxes
+
+
+# Intersection over union of two (top, right, bottom, left) boxes
+def iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.detected = True  # True when the box came from the detector on this frame
+        self.age = 0  # Frames since the track was created
+
+
+# Keeps face boxes alive between detections
+# Full detection (downscaled) runs every detect_every frames or as soon as a track is lost;
+# in between, each box is moved by the median Lucas-Kanade optical flow of corners inside it.
+# Detections are associated with existing tracks by IoU so track ids stay stable.
+class FaceTracker:
+    def __init__(self, detection_scale=DETECTION_SCALE, detect_every=DETECT_EVERY,
+                 iou_threshold=IOU_MATCH_THRESHOLD, model="hog"):
+        self.detection_scale = detection_scale
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.model = model
+        self.tracks = []
+        self.previous_gray = None
+        self.frames_since_detection = 0
+        self.next_id = itertools.count(1)
+        self.detections = 0
+        self.frames = 0
+
+    # Boxes for one frame; returns the list of current Track objects
+    # regions restricts a detection on this frame to candidate areas (see frame_gate.py)
+    # force_detection runs a detection on this frame even when tracking could carry on
+    def update(self, frame, rgb_img, regions=None, force_detection=False):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frames += 1
+
+        need_detection = (force_detection or self.previous_gray is None or not self.tracks
+                          or self.frames_since_detection + 1 >= self.detect_every)
+        if not need_detection:
+            need_detection = not self.propagate(gray)
+
+        if need_detection:
+            self.associate(detect_faces_scaled(rgb_img, self.detection_scale, self.model, regions))
+            self.frames_since_detection = 0
+            self.detections += 1
+        else:
+            self.frames_since_detection += 1
+
+        for track in self.tracks:
+            track.age += 1
+        self.previous_gray = gray
+        return list(self.tracks)
+
+    # Move every track by optical flow; returns False if any track was lost
+    def propagate(self, gray):
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            mask = np.zeros_like(self.previous_gray)
+            mask[top:bottom, left:right] = 255
+            points = cv2.goodFeaturesToTrack(self.previous_gray, maxCorners=40, qualityLevel=0.01,
+                                             minDistance=3, mask=mask)
+            if points is None or len(points) < MIN_TRACKED_POINTS:
+                return False
+
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, points, None)
+            good = status.reshape(-1) == 1
+            if good.sum() < MIN_TRACKED_POINTS:
+                return False
+
+            dx, dy = np.median((moved - points).reshape(-1, 2)[good], axis=0)
+            dx, dy = int(round(dx)), int(round(dy))
+            box = (top + dy, right + dx, bottom + dy, left + dx)
+            if box[0] < 0 or box[3] < 0 or box[2] > height or box[1] > width:
+                return False  # Leaving the frame; let the detector decide
+            track.box = box
+            track.detected = False
+        return True
+
+    # Greedy IoU matching of new detections to existing tracks
+    def associate(self, boxes):
+        pairs = sorted(((iou(track.box, box), t, b) for t, track in enumerate(self.tracks)
+                        for b, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        tracks = []
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+            track = self.tracks[t]
+            track.box = boxes[b]
+            track.detected = True
+            tracks.append(track)
+
+        # Unmatched detections start new tracks; unmatched tracks are dropped
+        for b, box in enumerate(boxes):
+            if b not in matched_boxes:
+                tracks.append(Track(next(self.next_id), box))
+        self.tracks = tracks
+
+    def stats(self):
+        return {"frames": self.frames, "detections": self.detections, "tracks": len(self.tracks)}
@@ -0,0 +1,112 @@
+import time
+import cv2
+import numpy as np
+
+MOTION_WIDTH = 160  # Frames are compared at this width; enough to see a person walking in
+PIXEL_DELTA = 25  # Grayscale change for a pixel to count as changed
+MOTION_FRACTION = 0.005  # Fraction of changed pixels that counts as motion
+CASCADE_WIDTH = 320  # Haar cascade runs at this width
+REGION_MARGIN = 0.5  # Candidate regions are grown by this fraction of the Haar box on each side
+FORCE_INTERVAL = 1.0  # Seconds between frames that skip the gate and get full dlib detection
+FORCE_WINDOW = 2.0  # Forced detections only continue this many seconds after the last motion
+
+
+# Decision for one frame: motion says whether anything changed since the previous frame,
+# regions lists (top, right, bottom, left) candidate areas where the Haar cascade saw a face
+# forced marks a periodic frame that must get full-frame detection whatever the checks say
+class GateDecision:
+    def __init__(self, motion, regions, forced=False):
+        self.motion = motion
+        self.regions = regions
+        self.forced = forced
+
+
+# Cheap gate in front of dlib: frame differencing first, then the OpenCV Haar cascade
+# (the detector face.py demonstrates) on grayscale. The expensive detector and encoder only
+# need to run when something moved and a face is plausibly present, and then only on the
+# candidate regions.
+# The frontal Haar cascade misses faces dlib finds (profile views, low light), so gating trades
+# some recall for speed. To bound that loss, one frame every force_interval seconds bypasses the
+# gate and gets full detection, but only while the scene is live: motion within the last
+# force_window seconds, faces in the last result, or tracks the caller is following. A static
+# empty scene never pays for dlib. force_interval=None turns forcing off.
+class FrameGate:
+    def __init__(self, pixel_delta=PIXEL_DELTA, motion_fraction=MOTION_FRACTION, use_cascade=True,
+                 force_interval=FORCE_INTERVAL, force_window=FORCE_WINDOW):
+        self.pixel_delta = pixel_delta
+        self.motion_fraction = motion_fraction
+        self.force_interval = force_interval
+        self.force_window = force_window
+        self.last_forced = None
+        self.last_motion = None
+        self.cascade = None
+        if use_cascade:
+            self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.previous_small = None
+        self.last_faces = []  # Result to reuse while nothing moves
+        self.frames = 0
+        self.idle_frames = 0
+        self.empty_frames = 0
+        self.forced_frames = 0
+
+    # tracking says the caller still follows faces from earlier frames
+    def check(self, frame, tracking=False):
+        self.frames += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape[:2]
+
+        # Frame differencing on a small blurred copy
+        small = cv2.resize(gray, (MOTION_WIDTH, max(1, height * MOTION_WIDTH // width)), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        previous, self.previous_small = self.previous_small, small
+
+        motion = True
+        if previous is not None:
+            changed = np.count_nonzero(cv2.absdiff(small, previous) > self.pixel_delta)
+            motion = changed >= self.motion_fraction * small.size
+
+        now = time.monotonic()
+        if motion:
+            self.last_motion = now
+        if self.force_due(now, tracking):
+            self.last_forced = now
+            self.forced_frames += 1
+            return GateDecision(True, None, forced=True)
+
+        if not motion:
+            self.idle_frames += 1
+            return GateDecision(False, None)
+
+        if self.cascade is None:
+            return GateDecision(True, None)
+
+        # Haar cascade on a downscaled grayscale frame
+        scale = min(1.0, CASCADE_WIDTH / width)
+        cascade_gray = cv2.resize(gray, (0, 0), fx=scale, fy=scale) if scale < 1 else gray
+        faces = self.cascade.detectMultiScale(cascade_gray, scaleFactor=1.1, minNeighbors=5, minSize=(20, 20))
+
+        regions = []
+        for (x, y, w, h) in faces:
+            margin_x, margin_y = w * REGION_MARGIN, h * REGION_MARGIN
+            regions.append((max(0, int((y - margin_y) / scale)), min(width, int((x + w + margin_x) / scale)),
+                            min(height, int((y + h + margin_y) / scale)), max(0, int((x - margin_x) / scale))))
+        if not regions:
+            self.empty_frames += 1
+        return GateDecision(True, regions)
+
+    def force_due(self, now, tracking):
+        if self.force_interval is None:
+            return False
+        if self.last_forced is not None and now - self.last_forced < self.force_interval:
+            return False
+        recent_motion = self.last_motion is not None and now - self.last_motion < self.force_window
+        return recent_motion or tracking or bool(self.last_faces)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "idle_frames": self.idle_frames,
+            "empty_frames": self.empty_frames,
+            "forced_frames": self.forced_frames,
+            "passed_frames": self.frames - self.idle_frames - self.empty_frames,
+        }
@@ -0,0 +1,112 @@
+import cv2
+from .face_models import face_recognition
+from .face_matcher import identify_faces
+from .face_tracking import detect_faces_scaled
+from .metrics import DISABLED
+
+
+# Sequence number of the newest frame applied to a camera's tracker and gate
+# Pipeline workers can reach that state out of frame order; advance() (called with state_lock
+# held) rejects a frame older than the last one applied, so tracks and the gate's motion
+# reference never move backwards in time. Rejected frames are dropped, not reordered: a newer
+# result already covers them.
+class FrameOrder:
+    def __init__(self):
+        self.applied_seq = 0
+        self.skipped = 0
+
+    def advance(self, seq):
+        if seq < self.applied_seq:
+            self.skipped += 1
+            return False
+        self.applied_seq = seq
+        return True
+
+# Detect, encode and identify every face in a BGR frame
+# Returns a list of ((top, right, bottom, left), (name, user_id, distance))
+# With a tracker, detection runs downscaled and only every few frames; tracked boxes are encoded in between
+# With an identity cache as well, tracks already recognized with confidence skip encoding and matching
+# With a gate, dlib only runs when the frame changed and the Haar cascade sees a plausible face,
+# plus a periodic forced full-frame detection, while the scene is live, that catches faces the cascade misses
+# With an encoding cache, faces whose crop has not materially changed reuse their last encoding
+# state_lock guards the tracker and gate, which keep state across frames
+# With a frame_order, seq is the frame's sequence number and a frame that reaches the tracker or
+# gate after a newer one returns None instead of updating them
+# Each stage is timed into metrics (a no-op with the default DISABLED)
+def detect_and_identify(frame, gallery, ann_index, recognition_threshold, tracker=None, state_lock=None,
+                        identity_cache=None, gate=None, metrics=DISABLED, encoding_cache=None, frame_order=None, seq=None):
+    # Skip detection entirely on unchanged frames and on frames with no face candidates
+    regions = None
+    forced = False
+    if gate is not None:
+        with state_lock, metrics.stage("gate"):
+            if frame_order is not None and not frame_order.advance(seq):
+                return None
+            tracking = tracker is not None and len(tracker.tracks) > 0
+            decision = gate.check(frame, tracking)
+            if not decision.motion:
+                return gate.last_faces
+        forced = decision.forced
+        if not forced:
+            if not decision.regions and not tracking:
+                gate.last_faces = []
+                return []
+            # Existing tracks are followed even when the cascade misses them (e.g. a turned head)
+            regions = decision.regions or None
+
+    # Convert the image from BGR to RGB
+    with metrics.stage("convert"):
+        rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    # Find all faces in the current frame
+    if tracker is None:
+        with metrics.stage("detect"):
+            if regions is None:
+                face_locations = face_recognition.face_locations(rgb_img)
+            else:
+                face_locations = detect_faces_scaled(rgb_img, 1, regions=regions)
+        track_ids = [None] * len(face_locations)
+    else:
+        with state_lock, metrics.stage("detect"):
+            if frame_order is not None and not frame_order.advance(seq):
+                return None
+            tracks = tracker.update(frame, rgb_img, regions, force_detection=forced)
+        face_locations = [track.box for track in tracks]
+        track_ids = [track.track_id for track in tracks]
+
+    # Reuse cached identities and only encode the faces that need (re-)verification
+    matches = [None] * len(face_locations)
+    if identity_cache is not None:
+        for i, (track_id, box) in enumerate(zip(track_ids, face_locations)):
+            if track_id is not None:
+                matches[i] = identity_cache.get(track_id, box)
+    pending = [i for i, match in enumerate(matches) if match is None]
+
+    if pending:
+        with metrics.stage("encode"):
+            boxes = [face_locations[i] for i in pending]
+            if encoding_cache is None:
+                face_encodings = face_recognition.face_encodings(rgb_img, boxes)
+            else:
+                face_encodings = encoding_cache.face_encodings(rgb_img, boxes)
+
+        # Compare every face in the frame against the whole gallery in one batch
+        with metrics.stage("match"):
+            new_matches = identify_faces(gallery, face_encodings, recognition_threshold, index=ann_index)
+        for i, match in zip(pending, new_matches):
+            matches[i] = match
+            if identity_cache is not None and track_ids[i] is not None:
+                identity_cache.put(track_ids[i], face_locations[i], match)
+
+    faces = list(zip(face_locations, matches))
+    if gate is not None:
+        with state_lock:
+            if frame_order is None or seq >= frame_order.applied_seq:
+                gate.last_faces = faces
+    return faces
+
+def draw_faces(frame, faces):
+    for (top, right, bottom, left), (name, user_id, distance) in faces:
+        # Draw a rectangle around the face and label it
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
@@ -0,0 +1,156 @@
+import threading
+import uuid
+import numpy as np
+from .ann_index import ANN_MIN_GALLERY_SIZE, DEFAULT_NPROBE, open_index
+from .encoding_format import ENCODING_FORMAT_VERSION
+from .face_db import get_connection, transaction
+from .face_matcher import DEFAULT_PRECISION, Gallery, decode_gallery_records, load_gallery, squared_norms, storage_dtype
+from .gallery_snapshot import open_gallery
+from .quantized_index import INDEX_TYPES, open_quantized_index
+
+POLL_INTERVAL = 1.0  # Seconds between PRAGMA data_version checks
+CHANGE_LOG_KEEP = 10000  # gallery_changes rows kept; a reader further behind than this reloads everything
+QUERY_CHUNK = 500  # Ids per IN (...) list, below SQLite's parameter limit
+
+
+# Keeps a running recognizer's gallery in step with the database
+# A background thread polls PRAGMA data_version on its own connection, which changes only
+# when another connection commits. It then reads the gallery_changes log written by triggers
+# (see face_db.py) and merges just the added, removed or renamed rows into a new Gallery.
+# The new gallery (and ANN index) replace the old pair in one assignment, so the frame loop
+# never waits: it reads `current` once per frame and keeps using whichever pair it got.
+# precision is the gallery storage: "float32" (default) or "float64" rows, with an IVF index
+# for large galleries, or "int8" / "pq" compressed codes that pick candidates for a float re-rank.
+class GalleryReloader(threading.Thread):
+    def __init__(self, db_path="face_data.db", poll_interval=POLL_INTERVAL, nprobe=DEFAULT_NPROBE,
+                 ann_min_size=ANN_MIN_GALLERY_SIZE, precision=DEFAULT_PRECISION):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.nprobe = nprobe
+        self.ann_min_size = ann_min_size
+        self.precision = precision
+        self.dtype = storage_dtype(precision)
+        self.stopped = threading.Event()
+        self.reloads = 0
+        self.full_reloads = 0
+
+        # Merging starts from the change log position the snapshot was built at, so whatever
+        # the snapshot is missing is merged by the first reload, which runs as the thread starts
+        gallery = open_gallery(db_path, self.dtype)
+        self.last_change = gallery.last_change
+        if self.last_change is None:
+            self.last_change = self.read_last_change(get_connection(db_path).cursor())
+        self.current = (gallery, self.open_index(gallery))
+
+    @staticmethod
+    def read_last_change(cursor):
+        cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM gallery_changes")
+        return cursor.fetchone()[0]
+
+    def stop(self):
+        self.stopped.set()
+
+    # Search structure for a gallery: compressed codes for the quantized precisions, else the IVF index
+    def open_index(self, gallery):
+        if self.precision in INDEX_TYPES:
+            return open_quantized_index(self.db_path, gallery, self.precision)
+        return open_index(self.db_path, gallery, self.nprobe, self.ann_min_size)
+
+    def run(self):
+        # SQLite connections belong to the thread that opened them
+        conn = get_connection(self.db_path)
+        data_version = None
+        while True:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != data_version:
+                data_version = version
+                try:
+                    self.reload(conn)
+                except Exception as e:
+                    print(f"Error reloading the gallery: {e}")
+            if self.stopped.wait(self.poll_interval):
+                break
+
+    # Merge everything logged since the last reload into a new gallery and publish it
+    def reload(self, conn):
+        cursor = conn.cursor()
+        conn.execute("BEGIN")  # One read transaction, so the log and the rows agree
+        try:
+            cursor.execute("SELECT MIN(change_id), MAX(change_id) FROM gallery_changes")
+            first_change, last_change = cursor.fetchone()
+            if last_change is None or last_change <= self.last_change:
+                return  # Some other table changed, e.g. attendance
+
+            gallery, index = self.current
+            if first_change > self.last_change + 1 or gallery.rowids is None:
+                # The log was pruned past our position; only a full load is correct
+                new_gallery = load_gallery(self.db_path, self.dtype)
+                new_gallery.build_id = uuid.uuid4().hex
+                self.full_reloads += 1
+            else:
+                new_gallery = self.merge_changes(cursor, gallery, self.last_change)
+        finally:
+            conn.rollback()
+
+        if last_change - first_change >= 2 * CHANGE_LOG_KEEP:
+            self.prune_log(conn, last_change - CHANGE_LOG_KEEP)
+
+        # Appends keep the build_id, so the index only has to add the new rows; anything else retrains
+        new_index = self.open_index(new_gallery)
+        self.current = (new_gallery, new_index)
+        self.last_change = last_change
+        self.reloads += 1
+        print(f"Gallery reloaded: {len(gallery)} -> {len(new_gallery)} templates")
+
+    # The merged gallery is a new private array: after the first merge this process no longer
+    # shares the snapshot's mapped pages with other recognizers, and holds its own copy of the
+    # matrix until the next start maps a refreshed snapshot again. np.unique over every id also
+    # makes a merge cost O(templates); both are fine for enrollments arriving a few at a time.
+    def merge_changes(self, cursor, gallery, after_change):
+        cursor.execute("SELECT template_id, user_id, change FROM gallery_changes WHERE change_id > ? ORDER BY change_id",
+                       (after_change,))
+        changed_templates = set()
+        changed_identities = set()
+        for template_id, user_id, change in cursor.fetchall():
+            if change == "identity":
+                changed_identities.add(user_id)
+            else:
+                changed_templates.add(template_id)
+
+        # Drop every row that changed, then read the current version of those rows back
+        keep = ~(np.isin(gallery.rowids, list(changed_templates)) | np.isin(gallery.ids, list(changed_identities)))
+        records = []
+        for column, values in (("t.template_id", sorted(changed_templates)), ("t.user_id", sorted(changed_identities))):
+            for start in range(0, len(values), QUERY_CHUNK):
+                chunk = values[start:start + QUERY_CHUNK]
+                cursor.execute(f'''SELECT t.rowid, t.user_id, f.name, t.encoding
+                                   FROM face_templates t JOIN faces f ON f.id = t.user_id
+                                   WHERE t.encoding_format = ? AND {column} IN ({",".join("?" * len(chunk))})''',
+                               [ENCODING_FORMAT_VERSION] + list(chunk))
+                records.extend(cursor.fetchall())
+        records = sorted(set((rowid, user_id, name, bytes(blob)) for rowid, user_id, name, blob in records))
+        matrix, ids, names, rowids = decode_gallery_records(records)
+        matrix = matrix.astype(gallery.encodings.dtype)
+
+        # Pure appends keep the row order and build_id, so an ANN index can be extended in place
+        appended = bool(keep.all()) and (len(gallery.rowids) == 0 or len(rowids) == 0
+                                         or rowids.min() > gallery.rowids.max())
+        build_id = gallery.build_id if appended else uuid.uuid4().hex
+        return Gallery(np.concatenate([gallery.encodings[keep], matrix]),
+                       np.concatenate([gallery.ids[keep], ids]),
+                       np.concatenate([gallery.names[keep], names]),
+                       sq_norms=np.concatenate([gallery.sq_norms[keep], squared_norms(matrix)]),
+                       build_id=build_id,
+                       rowids=np.concatenate([gallery.rowids[keep], rowids]),
+                       dtype=gallery.encodings.dtype)
+
+    # Keep the change log bounded; readers that fall behind the pruned range do a full reload
+    def prune_log(self, conn, up_to_change):
+        with transaction(conn) as cursor:
+            cursor.execute("DELETE FROM gallery_changes WHERE change_id <= ?", (up_to_change,))
+
+    def stats(self):
+        gallery, index = self.current
+        return {"templates": len(gallery), "precision": self.precision, "ann_index": index is not None,
+                "reloads": self.reloads, "full_reloads": self.full_reloads}
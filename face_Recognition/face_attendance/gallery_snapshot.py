@@ -0,0 +1,237 @@
+import json
+import os
+import sys
+import uuid
+import numpy as np
+from .encoding_format import ENCODING_SIZE, ENCODING_FORMAT_VERSION
+from .face_db import get_connection
+from .face_matcher import DEFAULT_DTYPE, Gallery, load_gallery, read_gallery_rows, squared_norms, warn_about_legacy_rows
+
+SNAPSHOT_DTYPE = np.float32  # Whatever precision a recognizer asks for, so they all share one snapshot
+SNAPSHOT_VERSION = 6  # 3: ids are always strings since the schema was unified; 4: template rowids; 5: encoding dtype;
+                      # 6: gallery_changes position
+
+
+# The snapshot lives next to the database:
+#   face_data.gallery.npy        (templates, 128) encodings (float32 by default), opened with mmap
+#   face_data.gallery.norms.npy  (templates,) squared norms so startup never touches the matrix
+#   face_data.gallery.json       ids, names, template rowids and the watermark the snapshot was built at
+# The watermark includes the last gallery_changes entry, so renames and in-place template
+# updates, which change neither the row count nor the highest rowid, still make it stale.
+# Appends keep the build_id; a full rebuild gets a new one because row order may change
+def snapshot_paths(db_path):
+    base = os.path.splitext(db_path)[0] + ".gallery"
+    return base + ".npy", base + ".norms.npy", base + ".json"
+
+
+# Cheap staleness check: number of gallery templates, the highest template rowid and the
+# last change logged by the gallery_changes triggers
+def read_watermark(cursor):
+    cursor.execute('''SELECT COUNT(*), COALESCE(MAX(t.rowid), 0)
+                      FROM face_templates t JOIN faces f ON f.id = t.user_id
+                      WHERE t.encoding_format = ?''', (ENCODING_FORMAT_VERSION,))
+    row_count, max_rowid = cursor.fetchone()
+    cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM gallery_changes")
+    return row_count, max_rowid, cursor.fetchone()[0]
+
+
+# True when everything logged after last_change only added templates and new identities,
+# so the rows already in the snapshot are still valid. A pruned log cannot tell, so it is False.
+def only_appended(cursor, last_change, known_ids):
+    cursor.execute("SELECT COALESCE(MIN(change_id), 0) FROM gallery_changes")
+    if cursor.fetchone()[0] > last_change + 1:
+        return False
+    cursor.execute("SELECT user_id, change FROM gallery_changes WHERE change_id > ?", (last_change,))
+    for user_id, change in cursor.fetchall():
+        if change == "delete" or (change == "identity" and user_id in known_ids):
+            return False
+    return True
+
+
+def read_sidecar(json_path):
+    try:
+        with open(json_path) as file:
+            sidecar = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get("version") != SNAPSHOT_VERSION:
+        return None
+    return sidecar
+
+
+# Write to a temporary file and rename it into place, so processes that already
+# mapped the old file keep reading it and nobody sees a half-written snapshot
+def replace_file(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        write(file)
+    os.replace(tmp_path, path)
+
+
+def write_sidecar(json_path, build_id, ids, names, rowids, row_count, max_rowid, last_change):
+    sidecar = {
+        "version": SNAPSHOT_VERSION,
+        "build_id": build_id,
+        "dtype": np.dtype(SNAPSHOT_DTYPE).name,
+        "row_count": row_count,
+        "max_rowid": max_rowid,
+        "last_change": last_change,
+        "templates": len(ids),
+        "ids": list(ids),
+        "names": list(names),
+        "rowids": [int(rowid) for rowid in rowids],
+    }
+    replace_file(json_path, lambda file: file.write(json.dumps(sidecar).encode("utf-8")))
+
+
+def load_array(path):
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # np.load cannot mmap a zero-length array, and there is nothing to share anyway
+        return np.load(path)
+
+
+# Bring the snapshot up to date with the faces table
+# Appends only rows added since the last build, and rebuilds everything otherwise
+def update_snapshot(db_path="face_data.db"):
+    matrix_path, norms_path, json_path = snapshot_paths(db_path)
+
+    # One read transaction, so the watermark and the rows come from the same database state
+    # even while an enroller is writing
+    conn = get_connection(db_path)
+    conn.execute("BEGIN")
+    cursor = conn.cursor()
+    try:
+        return write_snapshot(cursor, matrix_path, norms_path, json_path)
+    finally:
+        conn.rollback()
+
+
+# Compare the snapshot files with the database and append to or rebuild them; returns the status
+def write_snapshot(cursor, matrix_path, norms_path, json_path):
+    row_count, max_rowid, last_change = read_watermark(cursor)
+    sidecar = read_sidecar(json_path)
+    if sidecar and sidecar["dtype"] != np.dtype(SNAPSHOT_DTYPE).name:
+        sidecar = None
+    have_files = os.path.exists(matrix_path) and os.path.exists(norms_path)
+
+    if (sidecar and have_files and sidecar["row_count"] == row_count and sidecar["max_rowid"] == max_rowid
+            and sidecar["last_change"] == last_change):
+        return "fresh"
+
+    # Rows only appended since the last build: the old rows are still valid, so keep them
+    new_rows = None
+    if (sidecar and have_files and max_rowid > sidecar["max_rowid"]
+            and only_appended(cursor, sidecar["last_change"], set(sidecar["ids"]))):
+        cursor.execute('''SELECT COUNT(*) FROM face_templates t JOIN faces f ON f.id = t.user_id
+                          WHERE t.encoding_format = ? AND t.rowid > ?''', (ENCODING_FORMAT_VERSION, sidecar["max_rowid"]))
+        if sidecar["row_count"] + cursor.fetchone()[0] == row_count:
+            new_rows = read_gallery_rows(cursor, sidecar["max_rowid"])
+
+    if new_rows is not None:
+        _, new_matrix, new_ids, new_names, new_rowids = new_rows
+        new_matrix = new_matrix.astype(SNAPSHOT_DTYPE)
+        old_matrix = load_array(matrix_path)
+        old_norms = load_array(norms_path)
+        matrix = np.concatenate([old_matrix, new_matrix])
+        norms = np.concatenate([old_norms, squared_norms(new_matrix)])
+        ids = sidecar["ids"] + list(new_ids)
+        names = sidecar["names"] + list(new_names)
+        rowids = sidecar["rowids"] + list(new_rowids)
+        build_id = sidecar["build_id"]
+        status = "appended"
+    else:
+        _, matrix, ids, names, rowids = read_gallery_rows(cursor)
+        matrix = matrix.astype(SNAPSHOT_DTYPE)
+        norms = squared_norms(matrix)
+        # Existing rows may have moved, so anything derived from the old order is invalid
+        build_id = uuid.uuid4().hex
+        status = "rebuilt"
+
+    warn_about_legacy_rows(cursor)
+
+    # Matrix files first, sidecar last; open_gallery checks they agree
+    replace_file(matrix_path, lambda file: np.save(file, np.ascontiguousarray(matrix, dtype=SNAPSHOT_DTYPE)))
+    replace_file(norms_path, lambda file: np.save(file, np.ascontiguousarray(norms, dtype=np.float64)))
+    write_sidecar(json_path, build_id, ids, names, rowids, row_count, max_rowid, last_change)
+    return status
+
+
+# float64 recognizers map a full-precision companion of the snapshot:
+#   face_data.gallery.float64.npy, .float64.norms.npy and .float64.json (build_id, template count)
+# It has the snapshot's rows in the snapshot's order and follows its build_id, so indexes built
+# over either are valid for both, and it is only written by processes that ask for float64.
+def companion_paths(db_path, dtype):
+    base = f"{os.path.splitext(db_path)[0]}.gallery.{np.dtype(dtype).name}"
+    return base + ".npy", base + ".norms.npy", base + ".json"
+
+
+# Bring the companion up to date with the snapshot sidecar; returns (matrix, norms), or None
+# when the database no longer has the snapshot's rows
+def update_companion(db_path, sidecar, dtype):
+    matrix_path, norms_path, json_path = companion_paths(db_path, dtype)
+    templates = sidecar["templates"]
+    meta = read_sidecar(json_path)
+
+    # Same build: the first meta["templates"] rows are still valid, only appended rows are missing
+    known = 0
+    if (meta and os.path.exists(matrix_path) and os.path.exists(norms_path)
+            and meta["build_id"] == sidecar["build_id"] and meta["templates"] <= templates):
+        known = meta["templates"]
+    if known == templates:
+        return load_array(matrix_path), load_array(norms_path)
+
+    cursor = get_connection(db_path).cursor()
+    after_rowid = sidecar["rowids"][known - 1] if known else 0
+    _, new_matrix, _, _, new_rowids = read_gallery_rows(cursor, after_rowid)
+    if [int(rowid) for rowid in new_rowids] != sidecar["rowids"][known:]:
+        return None
+
+    new_matrix = np.asarray(new_matrix, dtype=dtype)
+    matrix, norms = new_matrix, squared_norms(new_matrix)
+    if known:
+        matrix = np.concatenate([load_array(matrix_path), matrix])
+        norms = np.concatenate([load_array(norms_path), norms])
+
+    replace_file(matrix_path, lambda file: np.save(file, np.ascontiguousarray(matrix, dtype=dtype)))
+    replace_file(norms_path, lambda file: np.save(file, np.ascontiguousarray(norms, dtype=np.float64)))
+    meta = {"version": SNAPSHOT_VERSION, "build_id": sidecar["build_id"], "templates": templates}
+    replace_file(json_path, lambda file: file.write(json.dumps(meta).encode("utf-8")))
+    return load_array(matrix_path), load_array(norms_path)
+
+
+# Open the gallery from its memory-mapped snapshot, refreshing the snapshot first if it is stale
+# Several recognizers on one machine share the mapped pages through the OS page cache
+# The snapshot is always float32, so recognizers with different precisions never rewrite it or
+# its build_id; dtype=np.float64 maps the full-precision companion of the same rows instead
+def open_gallery(db_path="face_data.db", dtype=DEFAULT_DTYPE):
+    update_snapshot(db_path)
+    matrix_path, norms_path, json_path = snapshot_paths(db_path)
+
+    sidecar = read_sidecar(json_path)
+    if sidecar is None or sidecar["templates"] == 0:
+        return Gallery(np.empty((0, ENCODING_SIZE)), [], [], rowids=[], dtype=dtype,
+                       last_change=sidecar["last_change"] if sidecar else None)
+
+    if np.dtype(dtype) == SNAPSHOT_DTYPE:
+        matrix = load_array(matrix_path)
+        norms = load_array(norms_path)
+    else:
+        companion = update_companion(db_path, sidecar, dtype)
+        if companion is None:
+            return load_gallery(db_path, dtype)
+        matrix, norms = companion
+
+    # Another process replaced the snapshot between our reads; fall back to the database
+    if (matrix.shape != (sidecar["templates"], ENCODING_SIZE) or norms.shape != (sidecar["templates"],)
+            or matrix.dtype != dtype):
+        return load_gallery(db_path, dtype)
+
+    return Gallery(matrix, sidecar["ids"], sidecar["names"], sq_norms=norms, build_id=sidecar["build_id"],
+                   rowids=sidecar["rowids"], dtype=dtype, last_change=sidecar["last_change"])
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "face_data.db"
+    print(f"Gallery snapshot {update_snapshot(db_path)}.")
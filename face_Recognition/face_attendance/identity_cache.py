@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from .face_tracking import iou
+
+CONFIDENT_DISTANCE = 0.45  # Only matches at least this close are reused without re-encoding
+REVERIFY_INTERVAL = 2.0  # Seconds a cached identity is trusted before the face is encoded again
+MIN_BOX_IOU = 0.5  # Re-verify early when the box has moved or resized more than this allows
+CACHE_TTL = 10.0  # Seconds an entry survives without its track being seen
+MAX_ENTRIES = 64
+
+
+class CacheEntry:
+    def __init__(self, match, box, now):
+        self.match = match
+        self.box = box
+        self.verified_at = now
+        self.last_seen = now
+
+
+# Per-track identity cache: once a tracked face is matched with high confidence, the
+# match is reused on following frames so face_encodings and gallery matching are skipped.
+# Entries are re-verified after reverify_interval seconds or when the box changes a lot,
+# and evicted after ttl seconds unseen or when more than max_entries tracks are cached (LRU).
+class IdentityCache:
+    def __init__(self, confident_distance=CONFIDENT_DISTANCE, reverify_interval=REVERIFY_INTERVAL,
+                 min_box_iou=MIN_BOX_IOU, ttl=CACHE_TTL, max_entries=MAX_ENTRIES):
+        self.confident_distance = confident_distance
+        self.reverify_interval = reverify_interval
+        self.min_box_iou = min_box_iou
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Cached (name, user_id, distance) for a track, or None when the face must be encoded
+    def get(self, track_id, box, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.expire(now)
+            entry = self.entries.get(track_id)
+            if (entry is None or now - entry.verified_at >= self.reverify_interval
+                    or iou(entry.box, box) < self.min_box_iou):
+                self.misses += 1
+                return None
+
+            entry.last_seen = now
+            self.entries.move_to_end(track_id)
+            self.hits += 1
+            return entry.match
+
+    # Remember a fresh match for a track; weak or unknown matches are dropped so they get re-checked
+    def put(self, track_id, box, match, now=None):
+        now = time.monotonic() if now is None else now
+        name, user_id, distance = match
+        with self.lock:
+            if user_id is None or distance is None or distance > self.confident_distance:
+                self.entries.pop(track_id, None)
+                return
+
+            self.entries[track_id] = CacheEntry(match, box, now)
+            self.entries.move_to_end(track_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Drop entries whose track has not been seen for ttl seconds; called with the lock held
+    def expire(self, now):
+        while self.entries:
+            track_id, entry = next(iter(self.entries.items()))
+            if now - entry.last_seen < self.ttl:
+                break
+            del self.entries[track_id]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import cv2
+import numpy as np
+
+# Face images live outside the database in a content-addressed store:
+#   <db directory>/face_images/<first two hex digits>/<sha256 of the JPEG>.jpg
+# faces.image_key holds the sha256. Identical images are stored once, files are never
+# modified after they are written, and the faces rows stay a few dozen bytes so gallery
+# loads and table scans never page through image data. An optional thumbnail sits next
+# to each image as <sha256>_thumb.jpg.
+IMAGE_STORE_DIR = "face_images"
+THUMBNAIL_WIDTH = 96
+
+
+def image_store_dir(db_path="face_data.db"):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), IMAGE_STORE_DIR)
+
+
+def image_path(key, db_path="face_data.db", thumbnail=False):
+    suffix = "_thumb.jpg" if thumbnail else ".jpg"
+    return os.path.join(image_store_dir(db_path), key[:2], key + suffix)
+
+
+# Write a file atomically so a reader never sees a partial image
+def write_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+# Key of JPEG bytes, known before they are stored so a row can be inserted first
+def image_key(jpeg_bytes):
+    return hashlib.sha256(jpeg_bytes).hexdigest()
+
+
+# Store JPEG bytes and return their key; storing the same bytes again is a no-op
+# Writers insert the row referencing the key first and call this before committing, so a
+# failed insert never leaves a file nothing references
+def put_image(jpeg_bytes, db_path="face_data.db", thumbnail=True):
+    key = image_key(jpeg_bytes)
+    path = image_path(key, db_path)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_file(path, jpeg_bytes)
+
+    thumb_path = image_path(key, db_path, thumbnail=True)
+    if thumbnail and not os.path.exists(thumb_path):
+        img = cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None and img.shape[1] > THUMBNAIL_WIDTH:
+            scale = THUMBNAIL_WIDTH / img.shape[1]
+            img = cv2.resize(img, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if img is not None:
+            _, thumb_encoded = cv2.imencode('.jpg', img)
+            write_file(thumb_path, thumb_encoded.tobytes())
+    return key
+
+
+# Remove an image and its thumbnail; only for keys no faces row references
+def delete_image(key, db_path="face_data.db"):
+    for thumbnail in (False, True):
+        try:
+            os.remove(image_path(key, db_path, thumbnail))
+        except FileNotFoundError:
+            pass
+
+
+# JPEG bytes for a key, or None when the file is missing
+def get_image(key, db_path="face_data.db", thumbnail=False):
+    try:
+        with open(image_path(key, db_path, thumbnail), "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,100 @@
+import cv2
+from .face_models import face_recognition
+from .attendance_dedup import AUTO_LOG_COOLDOWN, AttendanceDeduper
+from .attendance_log import AttendanceLogWriter
+from .face_db import init_db
+from .face_matcher import identify_faces
+from .gallery_reload import GalleryReloader
+from .metrics import start_metrics
+
+# log_cooldown is how many seconds pass before the same person is logged again
+# live_reload picks up enrollments, removals and renames without restarting
+# metrics_port serves per-stage latencies and counters at http://127.0.0.1:<port>/metrics;
+# metrics_file rewrites the same text every few seconds. With neither, nothing is measured
+def recognize_and_log_face(log_cooldown=AUTO_LOG_COOLDOWN, live_reload=True, metrics_port=None, metrics_file=None):
+    # Open the webcam first, so nothing else has been started if it is unavailable
+    cam = cv2.VideoCapture(0)
+    if not cam.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+
+    # Open stored face encodings, names and IDs from the memory-mapped gallery snapshot;
+    # large galleries also get an approximate index, small ones scan everything
+    # The reloader merges people enrolled while this runs into a new gallery in the background
+    reloader = GalleryReloader("face_data.db")
+    if live_reload:
+        reloader.start()
+
+    # Recognitions are queued and written in batches on a background thread
+    metrics, exporters = start_metrics(metrics_port, metrics_file)
+    attendance_log = AttendanceLogWriter("face_data.db", csv_path="recognition_log.csv", metrics=metrics)
+    attendance_log.start()
+    metrics.gauge("log_queue_depth", attendance_log.events.qsize)
+
+    cv2.namedWindow("Face Recognition")
+    recognition_threshold = 0.6  # Confidence threshold
+
+    deduper = AttendanceDeduper(log_cooldown)  # Per-person cooldown so alternating people are not logged over and over
+
+    while True:
+        with metrics.stage("read"):
+            ret, frame = cam.read()
+        if not ret:
+            print("Failed to grab frame. Exiting...")
+            break
+
+        # Convert the image from BGR to RGB
+        with metrics.stage("convert"):
+            rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # Find all faces and their encodings in the current frame
+        with metrics.stage("detect"):
+            face_locations = face_recognition.face_locations(rgb_img)
+        with metrics.stage("encode"):
+            face_encodings = face_recognition.face_encodings(rgb_img, face_locations)
+
+        # Compare every face in the frame against the whole gallery in one batch
+        gallery, ann_index = reloader.current
+        with metrics.stage("match"):
+            matches = identify_faces(gallery, face_encodings, recognition_threshold, index=ann_index)
+        metrics.frame(len(face_locations))
+
+        for (top, right, bottom, left), (name, user_id, best_match_distance) in zip(face_locations, matches):
+            if user_id is not None:
+                print(f"Recognized {name} (ID: {user_id})")
+
+                # Log each person at most once per cooldown window
+                if deduper.check_and_mark(user_id):
+                    attendance_log.log(name, user_id)
+            else:
+                name = "Unknown"
+                user_id = None
+                print("Face not recognized.")
+
+            # Draw a rectangle around the face and label it
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+        # Display the frame
+        with metrics.stage("display"):
+            cv2.imshow("Face Recognition", frame)
+            key = cv2.waitKey(1) % 256
+
+        # Wait for the ESC key to exit the loop
+        if key == 27:  # ESC key
+            break
+
+    # Write any queued attendance events before exiting
+    attendance_log.close()
+    reloader.stop()
+    for exporter in exporters:
+        exporter.stop()
+
+    # Release resources
+    cam.release()
+    cv2.destroyAllWindows()
+
+# Run the function
+if __name__ == "__main__":
+    init_db()  # Create or upgrade the database schema
+    recognize_and_log_face()
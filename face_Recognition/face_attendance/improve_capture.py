@@ -0,0 +1,101 @@
+import cv2
+from .face_models import face_recognition
+import sqlite3
+from .encoding_format import ENCODING_FORMAT_VERSION, encode_encodings
+from .face_db import close_connection, get_connection, init_db
+from .image_store import image_key, put_image
+from .sample_quality import SampleSelector
+
+def capture_and_store_face():
+    # Persistent connection from the shared data-access layer
+    conn = get_connection("face_data.db")
+    cursor = conn.cursor()
+
+    # Get user input for name and ID
+    name = input("Enter the name of the person: ")
+    user_id = input("Enter the ID of the person: ")
+
+    # Open the webcam
+    cam = cv2.VideoCapture(0)
+    if not cam.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+
+    cv2.namedWindow("Capture Face")
+    print("Position your face in front of the camera to start capturing.")
+
+    encodings_list = []  # List to store encodings
+    sample_count = 0  # Count of captured samples
+    selector = SampleSelector()  # Quality gate in front of the encoder
+    sample_frame = None  # Frame of the last accepted sample
+
+    while sample_count < 10:  # Capture more samples for better recognition
+        ret, frame = cam.read()
+        if not ret:
+            print("Failed to grab frame. Exiting...")
+            break
+
+        # Run the cheap quality checks first; only frames that pass are encoded
+        rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        box = selector.select(frame, rgb_img)
+
+        if box is not None:
+            # Encode the face at the box already found instead of detecting it again
+            encodings = face_recognition.face_encodings(rgb_img, [box])
+            if encodings:
+                encodings_list.append(encodings[0])
+                selector.accept()
+                sample_frame = frame
+                sample_count += 1
+                print(f"Captured {sample_count} samples.")
+
+        # Display the frame with a hint when it was not usable
+        display = frame.copy()
+        if selector.last_reason:
+            cv2.putText(display, selector.last_reason, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        cv2.imshow("Capture Face", display)
+
+        # Wait for the ESC key to exit the loop
+        if cv2.waitKey(1) % 256 == 27:  # ESC key
+            print("Face capture aborted.")
+            break
+
+    if not encodings_list:
+        print("No face samples captured. Nothing was stored.")
+        cam.release()
+        cv2.destroyAllWindows()
+        close_connection("face_data.db")
+        return
+
+    # Convert the captured frame (image) to a byte array (using the last accepted sample)
+    _, img_encoded = cv2.imencode('.jpg', sample_frame if sample_frame is not None else frame)
+    jpeg_bytes = img_encoded.tobytes()
+
+    # Keep every sample as its own template instead of averaging them; matching reduces them per person
+    encoding_blobs = [encode_encodings(encoding) for encoding in encodings_list]
+
+    # Insert the person once and every sample as its own template row, then store the image
+    # before committing, so a failed insert leaves no orphaned image behind
+    try:
+        cursor.execute("INSERT INTO faces (id, name, image_key) VALUES (?, ?, ?)",
+                       (user_id, name, image_key(jpeg_bytes)))
+        cursor.executemany("INSERT INTO face_templates (user_id, encoding, encoding_format) VALUES (?, ?, ?)",
+                           [(user_id, encoding_blob, ENCODING_FORMAT_VERSION) for encoding_blob in encoding_blobs])
+        put_image(jpeg_bytes)  # Stored on disk, the faces row keeps only the key
+        conn.commit()
+        print(f"Face data for {name} (ID: {user_id}) stored successfully!")
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error storing the face data: {e}")
+        conn.rollback()  # Leave the shared connection without a half-done transaction
+
+    print(f"Sample selection stats: {selector.stats()}")
+
+    # Release resources
+    cam.release()
+    cv2.destroyAllWindows()
+    close_connection("face_data.db")
+
+# Run the function
+if __name__ == "__main__":
+    init_db()  # Create or upgrade the database schema
+    capture_and_store_face()
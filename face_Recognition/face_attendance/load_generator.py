@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import cv2
+import numpy as np
+
+# Not imported from recognition_service.py so the client runs without dlib installed
+DEFAULT_URL = "http://127.0.0.1:8765/recognize"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+# JPEG bodies to send: every image in a directory (or one image file), or one generated frame
+def load_bodies(source):
+    if source is None:
+        frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+        return [cv2.imencode(".jpg", frame)[1].tobytes()]
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                       if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+    else:
+        paths = [source]
+    bodies = []
+    for path in paths:
+        with open(path, "rb") as file:
+            bodies.append(file.read())
+    return bodies
+
+
+# Send bodies to the service from concurrency threads for duration seconds
+# Every response is timed; 503s are counted as rejected (backpressure), anything else as an error
+def run_load(url, bodies, concurrency=8, duration=10.0, timeout=30.0):
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    latencies = []
+    counts = {"ok": 0, "rejected": 0, "errors": 0, "faces": 0}
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < deadline:
+            body = bodies[i % len(bodies)]
+            i += 1
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "image/jpeg"})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    faces = len(json.loads(response.read())["faces"])
+                outcome = "ok"
+            except urllib.error.HTTPError as e:
+                outcome = "rejected" if e.code == 503 else "errors"
+                faces = 0
+            except (urllib.error.URLError, OSError, ValueError):
+                outcome, faces = "errors", 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                counts[outcome] += 1
+                counts["faces"] += faces
+                if outcome == "ok":
+                    latencies.append(elapsed)
+            if outcome == "rejected":
+                time.sleep(0.01)  # Back off a little, as a well-behaved client would
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    report = dict(counts, seconds=elapsed, concurrency=concurrency,
+                  requests_per_second=counts["ok"] / elapsed if elapsed else 0.0)
+    if latencies:
+        latencies = np.asarray(latencies) * 1000.0
+        for q in (50, 95, 99):
+            report[f"p{q}_ms"] = float(np.percentile(latencies, q))
+        report["max_ms"] = float(latencies.max())
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the local recognition service.")
+    parser.add_argument("images", nargs="?", help="image file or directory to send (default: a generated frame)")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--crop", action="store_true", help="send the images as pre-cropped faces")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8],
+                        help="client threads; several values run one step each")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--output", help="also write the reports to this JSON file")
+    args = parser.parse_args()
+
+    bodies = load_bodies(args.images)
+    if not bodies:
+        print(f"Error: No images found in {args.images}.")
+        sys.exit(1)
+    url = args.url + ("?crop=1" if args.crop else "")
+
+    reports = []
+    for concurrency in args.concurrency:
+        report = run_load(url, bodies, concurrency, args.duration)
+        reports.append(report)
+        print(f"{concurrency:4d} clients: {report['requests_per_second']:8.1f} req/s, "
+              f"p50 {report.get('p50_ms', 0):7.1f} ms, p95 {report.get('p95_ms', 0):7.1f} ms, "
+              f"p99 {report.get('p99_ms', 0):7.1f} ms, {report['rejected']} rejected, {report['errors']} errors")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(reports, file, indent=2)
@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "face_recognition"
+LATENCY_WINDOW = 2048  # Recent durations kept per stage for quantiles
+FPS_WINDOW = 120  # Recent frames the FPS gauge is averaged over
+QUANTILES = (0.5, 0.95, 0.99)
+DUMP_INTERVAL = 5.0  # Seconds between metrics file dumps
+
+
+# Durations of one stage: running count and sum, plus a window of recent samples for quantiles
+class StageHistogram:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def quantiles(self):
+        return self.snapshot()[0]
+
+    # (quantiles, total, count) read together, so the sum and count in one export agree
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            total, count = self.total, self.count
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}, total, count
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}, total, count
+
+
+# Times one `with` block into a stage histogram
+class StageTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+# Stage timers, counters and gauges for a running recognizer
+# The loop wraps each stage in `with metrics.stage("read"):` and counts events with
+# metrics.count(); gauges are read from callables only when metrics are exported.
+class Metrics:
+    enabled = True
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.frame_times = deque(maxlen=FPS_WINDOW)
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(name, StageHistogram(self.window))
+        return StageTimer(histogram)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # One finished frame with faces faces in it; feeds the FPS gauge
+    def frame(self, faces):
+        self.frame_times.append(time.monotonic())
+        self.count("frames")
+        self.count("faces", faces)
+
+    # func() is called at export time; kind is "gauge" or "counter" (for totals kept elsewhere)
+    def gauge(self, name, func, kind="gauge"):
+        with self.lock:
+            self.gauges[name] = (func, kind)
+
+    def fps(self):
+        times = list(self.frame_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    # Copies of the registries, taken under the lock because the recognizer threads add
+    # stages and gauges while an exporter thread iterates them
+    def registered(self):
+        with self.lock:
+            return sorted(self.stages.items()), sorted(self.gauges.items()), dict(self.counters)
+
+    # Every metric in the Prometheus text exposition format
+    def render(self):
+        stages, gauges, counters = self.registered()
+        lines = [f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+        for name, histogram in stages:
+            quantiles, total, count = histogram.snapshot()
+            for q, value in quantiles.items():
+                lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {count}')
+
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_fps gauge")
+        lines.append(f"{METRIC_PREFIX}_fps {self.fps():.3f}")
+        frames = counters.get("frames", 0)
+        lines.append(f"# TYPE {METRIC_PREFIX}_faces_per_frame gauge")
+        lines.append(f"{METRIC_PREFIX}_faces_per_frame {counters.get('faces', 0) / frames if frames else 0.0:.3f}")
+
+        for name, (func, kind) in gauges:
+            try:
+                value = func()
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+                continue
+            suffix = "_total" if kind == "counter" else ""
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}{suffix} {kind}")
+            lines.append(f"{METRIC_PREFIX}_{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    def stats(self):
+        stages, _, _ = self.registered()
+        return {name: {f"p{int(q * 100)}_ms": value * 1000.0 for q, value in histogram.quantiles().items()}
+                for name, histogram in stages}
+
+
+# Stand-in used when metrics are off: every call is a no-op and stage() returns one
+# shared nullcontext, so an instrumented loop does no timing, locking or allocation
+class DisabledMetrics:
+    enabled = False
+    null_stage = nullcontext()
+
+    def stage(self, name):
+        return self.null_stage
+
+    def count(self, name, value=1):
+        pass
+
+    def frame(self, faces):
+        pass
+
+    def gauge(self, name, func, kind="gauge"):
+        pass
+
+    def stats(self):
+        return {}
+
+
+DISABLED = DisabledMetrics()
+
+
+# Serves metrics.render() at http://host:port/metrics for Prometheus or curl
+# Binds to localhost by default; the kiosk does not need to expose this to the network
+class MetricsServer(threading.Thread):
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        super().__init__(daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would otherwise print a line every few seconds
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Rewrites path with metrics.render() every interval seconds
+# The file is replaced atomically, so readers (or node_exporter's textfile collector) never see half of it
+class MetricsDumper(threading.Thread):
+    def __init__(self, metrics, path, interval=DUMP_INTERVAL):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                file.write(self.metrics.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing metrics to {self.path}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.dump()  # Leave the final numbers behind
+
+
+# Metrics for a recognizer: DISABLED unless a port or file is given, in which case the
+# exporters are started too. Returns (metrics, exporters); call stop() on each exporter at exit.
+def start_metrics(port=None, path=None, interval=DUMP_INTERVAL):
+    if port is None and path is None:
+        return DISABLED, []
+
+    metrics = Metrics()
+    exporters = []
+    if port is not None:
+        try:
+            exporters.append(MetricsServer(metrics, port))
+            print(f"Serving metrics at http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"Error: Could not serve metrics on port {port}: {e}")
+    if path is not None:
+        exporters.append(MetricsDumper(metrics, path, interval))
+        print(f"Writing metrics to {path} every {interval:g}s")
+    for exporter in exporters:
+        exporter.start()
+    return metrics, exporters
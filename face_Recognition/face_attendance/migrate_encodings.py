@@ -0,0 +1,83 @@
+import io
+import pickle
+import sqlite3
+import sys
+import numpy as np
+from .encoding_format import ENCODING_FORMAT_VERSION, ENCODING_SIZE, decode_encodings, encode_encodings
+from .face_db import connect
+
+# Only the numpy classes the old capture scripts could have pickled are allowed
+ALLOWED_PICKLE_GLOBALS = {
+    ("numpy", "ndarray"),
+    ("numpy", "dtype"),
+    ("numpy.core.multiarray", "_reconstruct"),
+    ("numpy.core.multiarray", "scalar"),
+    ("numpy._core.multiarray", "_reconstruct"),
+    ("numpy._core.multiarray", "scalar"),
+}
+
+
+class NumpyOnlyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in ALLOWED_PICKLE_GLOBALS:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from an encoding BLOB")
+        return super().find_class(module, name)
+
+
+# Turn any of the legacy pickle shapes into an (n, 128) array:
+# a single ndarray (capture_faces.py), a list of ndarrays (updated_capture_new.py)
+# or a mean vector (improve_capture.py)
+def legacy_blob_to_samples(encoding_blob):
+    encoding = NumpyOnlyUnpickler(io.BytesIO(encoding_blob)).load()
+
+    if isinstance(encoding, (list, tuple)):
+        samples = np.stack([np.asarray(sample, dtype=np.float64) for sample in encoding])
+    else:
+        samples = np.asarray(encoding, dtype=np.float64)
+
+    if samples.size == 0 or samples.size % ENCODING_SIZE != 0:
+        raise ValueError(f"unexpected encoding shape {samples.shape}")
+    return samples.reshape(-1, ENCODING_SIZE)
+
+
+# Move every encoding still stored on a faces row into face_templates, one row per sample,
+# in one transaction. Handles the legacy pickles and version 1 BLOBs holding several samples.
+def migrate_encodings(db_path="face_data.db"):
+    conn = connect(db_path)  # Also brings the schema up to date
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, name, encoding, encoding_format FROM faces WHERE encoding IS NOT NULL")
+    records = cursor.fetchall()
+
+    templates = []
+    migrated_ids = []
+    failed = 0
+    for user_id, name, encoding_blob, encoding_format in records:
+        try:
+            if encoding_format == ENCODING_FORMAT_VERSION:
+                samples = decode_encodings(encoding_blob)
+            else:
+                samples = legacy_blob_to_samples(encoding_blob)
+        except Exception as e:
+            print(f"Skipping {name} (ID: {user_id}): {e}")
+            failed += 1
+            continue
+        templates.extend((user_id, encode_encodings(sample), ENCODING_FORMAT_VERSION) for sample in samples)
+        migrated_ids.append((user_id,))
+
+    try:
+        cursor.executemany("INSERT INTO face_templates (user_id, encoding, encoding_format) VALUES (?, ?, ?)", templates)
+        cursor.executemany("UPDATE faces SET encoding = NULL, encoding_format = NULL WHERE id = ?", migrated_ids)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error migrating encodings: {e}")
+        conn.close()
+        return
+
+    conn.close()
+    print(f"Migrated {len(migrated_ids)} faces into {len(templates)} templates "
+          f"({failed} failed, {len(records)} rows found).")
+
+if __name__ == "__main__":
+    migrate_encodings(sys.argv[1] if len(sys.argv) > 1 else "face_data.db")
@@ -0,0 +1,52 @@
+import sqlite3
+import sys
+from .face_db import connect
+from .image_store import put_image
+
+MIGRATE_BATCH = 500  # Rows per transaction; a re-run after an interruption continues where it stopped
+
+
+# Move every image still stored in faces.image into the content-addressed image store,
+# record its key in faces.image_key and clear the BLOB, then VACUUM so the file shrinks
+def migrate_images(db_path="face_data.db"):
+    conn = connect(db_path)  # Also brings the schema up to date, including the image_key column
+    cursor = conn.cursor()
+
+    migrated = 0
+    failed = 0
+    last_rowid = 0
+    while True:
+        cursor.execute("SELECT rowid, id, image FROM faces WHERE rowid > ? AND length(image) > 0 "
+                       "ORDER BY rowid LIMIT ?", (last_rowid, MIGRATE_BATCH))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+
+        updates = []
+        for rowid, user_id, image_blob in rows:
+            try:
+                updates.append((put_image(bytes(image_blob), db_path), rowid))
+            except OSError as e:
+                print(f"Skipping image of ID {user_id}: {e}")
+                failed += 1
+
+        # Files are written before the rows point at them, so an interruption never leaves a dangling key
+        try:
+            cursor.executemany("UPDATE faces SET image_key = ?, image = NULL WHERE rowid = ?", updates)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error migrating images: {e}")
+            conn.close()
+            return
+        migrated += len(updates)
+        print(f"Moved {migrated} images")
+
+    # Give the freed pages back to the file system
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Migrated {migrated} images to the image store ({failed} failed).")
+
+if __name__ == "__main__":
+    migrate_images(sys.argv[1] if len(sys.argv) > 1 else "face_data.db")
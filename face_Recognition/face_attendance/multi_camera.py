@@ -0,0 +1,294 @@
+import argparse
+import os
+import threading
+import time
+import cv2
+from .attendance_dedup import AUTO_LOG_COOLDOWN, AttendanceDeduper
+from .attendance_log import AttendanceLogWriter
+from .encoding_cache import EncodingCache
+from .face_db import init_db
+from .face_matcher import DEFAULT_PRECISION, DEFAULT_THRESHOLD
+from .face_tracking import DETECTION_SCALE, DETECT_EVERY, FaceTracker
+from .frame_gate import FrameGate
+from .frame_recognition import detect_and_identify, draw_faces
+from .gallery_reload import GalleryReloader
+from .quantized_index import PRECISIONS
+from .identity_cache import REVERIFY_INTERVAL, IdentityCache
+from .metrics import start_metrics
+from .pipeline import FrameGrabber
+
+STATS_INTERVAL = 10.0  # Seconds between stats lines
+
+
+# Video files are read at their own frame rate, like a camera delivers frames,
+# instead of as fast as they decode
+class PacedCapture:
+    def __init__(self, cam):
+        self.cam = cam
+        fps = cam.get(cv2.CAP_PROP_FPS) or 0
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        self.next_frame_at = None
+
+    def isOpened(self):
+        return self.cam.isOpened()
+
+    def read(self):
+        now = time.monotonic()
+        if self.next_frame_at is not None and now < self.next_frame_at:
+            time.sleep(self.next_frame_at - now)
+        self.next_frame_at = max(now, self.next_frame_at or now) + self.frame_interval
+        return self.cam.read()
+
+    def release(self):
+        self.cam.release()
+
+
+# One camera or video source: its grabber thread, its own tracker, identity cache, gate and encoding cache,
+# and the newest result produced for it
+class Stream:
+    def __init__(self, name, source, on_frame=None, use_tracking=True, use_gate=True, use_encoding_cache=False,
+                 detection_scale=DETECTION_SCALE, detect_every=DETECT_EVERY, reverify_interval=REVERIFY_INTERVAL):
+        self.name = name
+        self.source = source
+        self.cam = cv2.VideoCapture(source)
+        if isinstance(source, str) and os.path.isfile(source):
+            self.cam = PacedCapture(self.cam)
+        self.grabber = FrameGrabber(self.cam, on_frame)
+        self.tracker = FaceTracker(detection_scale, detect_every) if use_tracking else None
+        self.identity_cache = IdentityCache(reverify_interval=reverify_interval) if use_tracking else None
+        self.gate = FrameGate() if use_gate else None
+        self.encoding_cache = EncodingCache() if use_encoding_cache else None
+        self.state_lock = threading.Lock()
+        self.in_flight = False  # A worker is processing one of this stream's frames
+        self.result_seq = 0
+        self.result = []
+        self.frame = None
+        self.processed = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def opened(self):
+        return self.cam.isOpened()
+
+    def stats(self, elapsed):
+        return {
+            "captured": self.grabber.captured,
+            "dropped": self.grabber.dropped,
+            "processed": self.processed,
+            "processed_fps": self.processed / elapsed if elapsed else 0.0,
+            "inference_ms": 1000.0 * self.busy_seconds / self.processed if self.processed else 0.0,
+            "finished": self.grabber.failed,
+            "encoding_cache": self.encoding_cache.stats() if self.encoding_cache is not None else None,
+        }
+
+
+# Round-robin scheduling of inference across streams
+# Each stream has at most one frame in flight and only its freshest frame is ever processed,
+# so a busy entrance can take at most one worker at a time and can never queue work ahead
+# of the others; idle workers scan the streams starting after the one served last.
+class FairScheduler:
+    def __init__(self, streams=None):
+        self.streams = streams or []
+        self.next_index = 0
+        self.condition = threading.Condition()
+        self.stopped = False
+
+    # Called by the grabbers whenever a stream has a new frame
+    def notify(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    # (stream, seq, frame) for the next stream with a fresh frame and nothing in flight, or None on stop
+    def take(self, timeout=1.0):
+        with self.condition:
+            while not self.stopped:
+                for offset in range(len(self.streams)):
+                    index = (self.next_index + offset) % len(self.streams)
+                    stream = self.streams[index]
+                    if stream.in_flight or stream.grabber.seq <= stream.grabber.taken_seq:
+                        continue
+                    item = stream.grabber.take(timeout=0)
+                    if item is None:
+                        continue
+                    stream.in_flight = True
+                    self.next_index = index + 1
+                    return stream, item[0], item[1]
+                self.condition.wait(timeout)
+            return None
+
+    def done(self, stream):
+        with self.condition:
+            stream.in_flight = False
+            self.condition.notify_all()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+# Recognize faces from several cameras or video sources in one process
+# The dlib models, the gallery (with live reload and ANN index), the attendance writer and the
+# per-person cooldown are shared by every stream; capture, tracking and gating are per stream.
+# inference_workers threads run detection and encoding (dlib releases the GIL) on the streams
+# in round-robin order. With show=False nothing is displayed and the loop only logs.
+def run_streams(sources, inference_workers=None, show=True, use_tracking=True, use_gate=True,
+                recognition_threshold=DEFAULT_THRESHOLD, log_cooldown=AUTO_LOG_COOLDOWN, live_reload=True,
+                metrics_port=None, metrics_file=None, use_encoding_cache=False, gallery_precision=DEFAULT_PRECISION,
+                db_path="face_data.db"):
+    scheduler = FairScheduler()
+    streams = scheduler.streams
+    for source in sources:
+        name = f"Camera {source}" if isinstance(source, int) else str(source)
+        stream = Stream(name, source, scheduler.notify, use_tracking, use_gate, use_encoding_cache)
+        if not stream.opened:
+            print(f"Error: Could not open {name}. Skipping it.")
+            continue
+        streams.append(stream)
+    if not streams:
+        print("Error: No camera or video source could be opened.")
+        return None
+
+    reloader = GalleryReloader(db_path, precision=gallery_precision)
+    if live_reload:
+        reloader.start()
+
+    metrics, exporters = start_metrics(metrics_port, metrics_file)
+    attendance_log = AttendanceLogWriter(db_path, csv_path="recognition_log.csv", metrics=metrics)
+    attendance_log.start()
+    metrics.gauge("log_queue_depth", attendance_log.events.qsize)
+    metrics.gauge("dropped_frames", lambda: sum(stream.grabber.dropped for stream in streams), kind="counter")
+    deduper = AttendanceDeduper(log_cooldown)  # Shared, so walking past two entrances logs once
+
+    def run_worker():
+        while True:
+            item = scheduler.take()
+            if item is None:
+                return
+            stream, seq, frame = item
+            started = time.perf_counter()
+            try:
+                gallery, ann_index = reloader.current
+                with metrics.stage("inference"):
+                    faces = detect_and_identify(frame, gallery, ann_index, recognition_threshold, stream.tracker,
+                                                stream.state_lock, stream.identity_cache, stream.gate, metrics,
+                                                stream.encoding_cache)
+                metrics.frame(len(faces))
+            except Exception as e:
+                print(f"Error processing {stream.name} frame {seq}: {e}")
+                faces = None
+            with scheduler.condition:
+                stream.busy_seconds += time.perf_counter() - started
+                stream.processed += 1
+                if faces is not None:
+                    stream.result_seq, stream.result, stream.frame = seq, faces, frame
+            scheduler.done(stream)
+
+    workers = [threading.Thread(target=run_worker, daemon=True)
+               for _ in range(inference_workers or len(streams))]
+    started_at = time.monotonic()
+    for stream in streams:
+        stream.grabber.start()
+    for worker in workers:
+        worker.start()
+
+    handled = {stream.name: 0 for stream in streams}  # Newest result already logged, per stream
+    last_stats = started_at
+    try:
+        while not all(stream.grabber.failed for stream in streams):
+            for stream in streams:
+                with scheduler.condition:
+                    seq, faces, frame = stream.result_seq, stream.result, stream.frame
+                if seq <= handled[stream.name]:
+                    continue
+                handled[stream.name] = seq
+
+                for _, (name, user_id, distance) in faces:
+                    if user_id is not None and deduper.check_and_mark(user_id):
+                        print(f"{stream.name}: recognized {name} (ID: {user_id})")
+                        attendance_log.log(name, user_id)
+
+                if show:
+                    with metrics.stage("display"):
+                        frame = frame.copy()
+                        draw_faces(frame, faces)
+                        cv2.imshow(stream.name, frame)
+
+            if show:
+                # Wait for the ESC key to exit the loop
+                if cv2.waitKey(1) % 256 == 27:
+                    break
+            else:
+                time.sleep(0.005)
+
+            now = time.monotonic()
+            if now - last_stats >= STATS_INTERVAL:
+                print(f"Stream stats: {stream_stats(streams, now - started_at)}")
+                last_stats = now
+    except KeyboardInterrupt:
+        pass
+
+    scheduler.stop()
+    for stream in streams:
+        stream.grabber.stop()
+    for worker in workers:
+        worker.join(timeout=5.0)
+    for stream in streams:
+        stream.grabber.join(timeout=1.0)
+        stream.cam.release()
+
+    stats = stream_stats(streams, time.monotonic() - started_at)
+    print(f"Stream stats: {stats}")
+    attendance_log.close()
+    reloader.stop()
+    for exporter in exporters:
+        exporter.stop()
+    if show:
+        cv2.destroyAllWindows()
+    return stats
+
+
+# Per-stream stats plus totals over all streams
+def stream_stats(streams, elapsed):
+    per_stream = {stream.name: stream.stats(elapsed) for stream in streams}
+    processed = sum(stats["processed"] for stats in per_stream.values())
+    return {
+        "streams": per_stream,
+        "total": {
+            "captured": sum(stats["captured"] for stats in per_stream.values()),
+            "dropped": sum(stats["dropped"] for stats in per_stream.values()),
+            "processed": processed,
+            "processed_fps": processed / elapsed if elapsed else 0.0,
+        },
+    }
+
+
+# Camera indices are given as numbers, anything else is a file path or stream URL
+def parse_source(source):
+    return int(source) if source.isdigit() else source
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recognize faces from several cameras in one process.")
+    parser.add_argument("sources", nargs="+", help="camera indices, video files or stream URLs")
+    parser.add_argument("--workers", type=int, default=None, help="inference threads (default: one per stream)")
+    parser.add_argument("--headless", action="store_true", help="do not open any windows")
+    parser.add_argument("--no-tracking", action="store_true", help="run full detection on every frame")
+    parser.add_argument("--no-gate", action="store_true", help="run dlib on every frame, even without motion")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--db", default="face_data.db")
+    parser.add_argument("--cooldown", type=float, default=AUTO_LOG_COOLDOWN,
+                        help="seconds before the same person is logged again")
+    parser.add_argument("--encoding-cache", action="store_true",
+                        help="reuse encodings of face crops that have not changed")
+    parser.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION,
+                        help="gallery storage; int8 and pq search compressed codes with a float re-rank")
+    parser.add_argument("--metrics-port", type=int, default=None)
+    parser.add_argument("--metrics-file", default=None)
+    args = parser.parse_args()
+
+    init_db(args.db)  # Create or upgrade the database schema
+    run_streams([parse_source(source) for source in args.sources], args.workers, not args.headless,
+                not args.no_tracking, not args.no_gate, args.threshold, args.cooldown,
+                metrics_port=args.metrics_port, metrics_file=args.metrics_file,
+                use_encoding_cache=args.encoding_cache, gallery_precision=args.precision, db_path=args.db)
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import deque
+
+
+# Bounded FIFO that drops the oldest item instead of blocking when it is full,
+# so a slow consumer always works on recent data and never builds a backlog
+class DropOldestQueue:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    # Returns None on timeout or once the queue is closed and empty
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+# Reads the camera as fast as it delivers and keeps only the freshest frame,
+# so frames never pile up in the driver buffer behind a slow consumer
+# on_frame, if given, is called after every new frame (or failure) so a consumer can wake up
+class FrameGrabber(threading.Thread):
+    def __init__(self, cam, on_frame=None):
+        super().__init__(daemon=True)
+        self.cam = cam
+        self.on_frame = on_frame
+        self.frame = None
+        self.seq = 0
+        self.taken_seq = 0
+        self.captured = 0
+        self.dropped = 0  # Frames replaced before anyone took them
+        self.failed = False
+        self.stopped = threading.Event()
+        self.condition = threading.Condition()
+
+    def run(self):
+        while not self.stopped.is_set():
+            ret, frame = self.cam.read()
+            with self.condition:
+                if not ret:
+                    self.failed = True
+                    self.condition.notify_all()
+                else:
+                    if self.seq > self.taken_seq:
+                        self.dropped += 1
+                    self.frame = frame
+                    self.seq += 1
+                    self.captured += 1
+                    self.condition.notify_all()
+            if self.on_frame is not None:
+                self.on_frame()
+            if not ret:
+                return
+
+    # Wait for a frame newer than the last one taken; returns (seq, frame) or None
+    def take(self, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > self.taken_seq or self.failed, timeout):
+                return None
+            if self.seq <= self.taken_seq:
+                return None
+            self.taken_seq = self.seq
+            return self.seq, self.frame
+
+    def stop(self):
+        self.stopped.set()
+
+
+# Capture -> inference -> display pipeline for a recognizer loop
+# A grabber thread holds the freshest camera frame, a pool of worker threads runs
+# process_frame(frame, seq) on it (dlib releases the GIL during detection and encoding),
+# and the display loop calls next_frame()/latest_result() without ever waiting on inference.
+# latest_result() is for drawing and may skip results; finished_results() hands over every
+# result exactly once, for consumers such as attendance logging that must not miss any.
+# process_frame returns None for a frame it skipped because a newer one already updated
+# the tracker and gate (see frame_recognition.FrameOrder); that counts as a stale result.
+class RecognitionPipeline:
+    def __init__(self, cam, process_frame, workers=2, queue_size=None):
+        self.grabber = FrameGrabber(cam)
+        self.process_frame = process_frame
+        self.inference_queue = DropOldestQueue(queue_size or workers)
+        self.workers = [threading.Thread(target=self.run_worker, daemon=True) for _ in range(workers)]
+        self.result_lock = threading.Lock()
+        self.result_seq = 0
+        self.result = []
+        self.finished = deque()  # (seq, result) not yet taken by finished_results()
+        self.processed = 0
+        self.stale_results = 0  # Results that finished after a newer frame's result, or were skipped
+        self.started_at = None
+
+    @property
+    def failed(self):
+        return self.grabber.failed
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.grabber.start()
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        self.grabber.stop()
+        self.inference_queue.close()
+        self.grabber.join(timeout=1.0)
+        for worker in self.workers:
+            worker.join(timeout=5.0)
+
+    def run_worker(self):
+        while True:
+            item = self.inference_queue.get()
+            if item is None:
+                return
+            seq, frame = item
+            try:
+                result = self.process_frame(frame, seq)
+            except Exception as e:
+                print(f"Error processing frame {seq}: {e}")
+                continue
+
+            # Workers can finish out of order; only a newer frame's result replaces the current one
+            with self.result_lock:
+                self.processed += 1
+                if result is not None:
+                    self.finished.append((seq, result))
+                if result is not None and seq > self.result_seq:
+                    self.result_seq = seq
+                    self.result = result
+                else:
+                    self.stale_results += 1
+
+    # Freshest camera frame, also queued for inference; None on timeout or camera failure
+    # The frame is shared with the workers, so draw on a copy
+    def next_frame(self, timeout=None):
+        item = self.grabber.take(timeout)
+        if item is not None:
+            self.inference_queue.put(item)
+        return item
+
+    # (seq, result) of the newest frame processed so far
+    def latest_result(self):
+        with self.result_lock:
+            return self.result_seq, self.result
+
+    # Every (seq, result) finished since the last call, in frame order
+    def finished_results(self):
+        with self.result_lock:
+            results = sorted(self.finished, key=lambda item: item[0])
+            self.finished.clear()
+        return results
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9) if self.started_at else 0
+        with self.result_lock:
+            processed = self.processed
+            stale_results = self.stale_results
+        return {
+            "captured": self.grabber.captured,
+            "capture_dropped": self.grabber.dropped,
+            "inference_dropped": self.inference_queue.dropped,
+            "inference_queue_depth": len(self.inference_queue),
+            "processed": processed,
+            "stale_results": stale_results,
+            "processed_fps": processed / elapsed if elapsed else 0.0,
+        }
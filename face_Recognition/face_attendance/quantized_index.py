@@ -0,0 +1,212 @@
+import os
+import numpy as np
+from .ann_index import RETRAIN_GROWTH, assign_to_centroids, kmeans
+from .encoding_format import ENCODING_SIZE
+from .face_matcher import DEFAULT_REDUCTION, GALLERY_DTYPES, rerank_candidates, smallest_k
+
+QUANTIZED_INDEX_VERSION = 1
+RERANK_TEMPLATES = 64  # Closest templates by the compressed distance that go on to the float re-rank
+RERANK_IDENTITIES = 16  # Identities among those re-scored exactly over all their templates
+TRAIN_SAMPLE = 65536  # Rows the quantizer parameters are fitted on
+SCAN_CHUNK = 16384  # Codes expanded at a time, so the float copy of a chunk stays in cache
+PQ_SUBSPACES = 16  # 8 dimensions each, one byte per subspace: 16 bytes per template
+PQ_CENTROIDS = 256
+
+
+# Compressed copy of the gallery used to generate candidates for the exact float re-rank
+# Codes are what a large gallery scan reads: 128 bytes per template for int8 and 16 for pq,
+# against 512 for float32. The float rows are only read for the few re-ranked templates,
+# so with a memory-mapped snapshot most of them never have to be resident.
+class QuantizedIndex:
+    kind = None
+    code_dtype = None
+
+    def __init__(self, codebook, codes=None, trained_size=0, build_id=None, rerank=RERANK_TEMPLATES):
+        self.codebook = np.asarray(codebook, dtype=np.float32)
+        self.codes = np.empty((0, self.code_width()), dtype=self.code_dtype) if codes is None else codes
+        self.trained_size = trained_size
+        self.build_id = build_id
+        self.rerank = rerank
+
+    def __len__(self):
+        return len(self.codes)
+
+    # Fit the quantizer on a sample of the gallery and encode every row
+    @classmethod
+    def train(cls, gallery, seed=0):
+        size = len(gallery)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(size, min(size, TRAIN_SAMPLE), replace=False))
+        sample = np.asarray(gallery.encodings[sample_rows], dtype=np.float64)
+
+        index = cls(cls.fit(sample, seed), trained_size=size, build_id=gallery.build_id)
+        index.add(gallery.encodings)
+        return index
+
+    # Encode new gallery rows; they are numbered after the rows already encoded
+    def add(self, vectors):
+        vectors = np.asarray(vectors).reshape(-1, ENCODING_SIZE)
+        if len(vectors) == 0:
+            return
+        new_codes = [self.encode(np.asarray(vectors[start:start + SCAN_CHUNK], dtype=np.float64))
+                     for start in range(0, len(vectors), SCAN_CHUNK)]
+        self.codes = np.concatenate([self.codes] + new_codes)
+
+    @property
+    def bytes_per_template(self):
+        return self.codes.itemsize * self.code_width()
+
+    # Approximate top-k identities for every face, in the same shape face_matcher.match_faces returns
+    # The rerank templates closest by compressed distance name the candidate identities,
+    # which are then scored with the float distance
+    def search(self, gallery, face_encodings, k=1, reduce=DEFAULT_REDUCTION):
+        faces = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        candidates, _ = smallest_k(self.approximate_distances(faces), self.rerank)
+        return [rerank_candidates(gallery, face, ranked, k, RERANK_IDENTITIES, reduce)
+                for face, ranked in zip(faces, candidates)]
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, version=QUANTIZED_INDEX_VERSION, kind=self.kind, codebook=self.codebook,
+                     codes=self.codes, trained_size=self.trained_size, build_id=str(self.build_id))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            if int(data["version"]) != QUANTIZED_INDEX_VERSION:
+                raise ValueError(f"Unsupported quantized index version {int(data['version'])}")
+            index_type = INDEX_TYPES[str(data["kind"])]
+            return index_type(data["codebook"], data["codes"].astype(index_type.code_dtype),
+                              trained_size=int(data["trained_size"]), build_id=str(data["build_id"]))
+
+
+# Scalar quantization: every dimension scaled to int8, 4x smaller than float32
+# Distances to the reconstructed rows are |x|^2 - 2 q.x, scanned as float32 matrix
+# multiplies over chunks of codes; |q|^2 is the same for every row and left out.
+class Int8Index(QuantizedIndex):
+    kind = "int8"
+    code_dtype = np.int8
+
+    def __init__(self, codebook, codes=None, trained_size=0, build_id=None, rerank=RERANK_TEMPLATES):
+        super().__init__(codebook, codes, trained_size, build_id, rerank)
+        self.code_norms = self.reconstructed_norms(self.codes)
+
+    # One scale per dimension, mapping the largest value in the sample to 127
+    @staticmethod
+    def fit(sample, seed=0):
+        scale = np.abs(sample).max(axis=0) / 127.0
+        return np.where(scale > 0, scale, 1.0)
+
+    @staticmethod
+    def code_width():
+        return ENCODING_SIZE
+
+    # Values beyond the fitted range are clipped; the float re-rank corrects the distance
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors / self.codebook), -127, 127).astype(np.int8)
+
+    def reconstructed_norms(self, codes):
+        norms = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_CHUNK):
+            rows = codes[start:start + SCAN_CHUNK] * self.codebook
+            norms[start:start + SCAN_CHUNK] = np.einsum("ij,ij->i", rows, rows)
+        return norms
+
+    def add(self, vectors):
+        known = len(self.codes)
+        super().add(vectors)
+        self.code_norms = np.concatenate([self.code_norms, self.reconstructed_norms(self.codes[known:])])
+
+    @property
+    def bytes_per_template(self):
+        return super().bytes_per_template + self.code_norms.itemsize
+
+    def approximate_distances(self, faces):
+        weights = (faces * self.codebook).astype(np.float32)  # q . (codes * scale) == (q * scale) . codes
+        distances = np.empty((len(self.codes), len(faces)), dtype=np.float32)
+        for start in range(0, len(self.codes), SCAN_CHUNK):
+            chunk = self.codes[start:start + SCAN_CHUNK].astype(np.float32)
+            distances[start:start + SCAN_CHUNK] = self.code_norms[start:start + SCAN_CHUNK, None] - 2.0 * (chunk @ weights.T)
+        return distances.T
+
+
+# Product quantization: the 128 dimensions are split into PQ_SUBSPACES groups, each replaced
+# by the index of its nearest of PQ_CENTROIDS k-means centroids, 32x smaller than float32.
+# Distances come from one small table per face (subspace x centroid) summed over the codes.
+# Codes are kept column-major, so each subspace's codes are one contiguous lookup with np.take.
+class PQIndex(QuantizedIndex):
+    kind = "pq"
+    code_dtype = np.uint8
+
+    def __init__(self, codebook, codes=None, trained_size=0, build_id=None, rerank=RERANK_TEMPLATES):
+        super().__init__(codebook, codes, trained_size, build_id, rerank)
+        self.codes = np.asfortranarray(self.codes)
+
+    # One codebook of (centroids, dimensions per subspace) for every subspace
+    @staticmethod
+    def fit(sample, seed=0):
+        width = ENCODING_SIZE // PQ_SUBSPACES
+        centroids = min(PQ_CENTROIDS, len(sample))
+        return np.stack([kmeans(sample[:, m * width:(m + 1) * width], centroids, seed=seed)
+                         for m in range(PQ_SUBSPACES)])
+
+    @staticmethod
+    def code_width():
+        return PQ_SUBSPACES
+
+    def encode(self, vectors):
+        width = self.codebook.shape[2]
+        return np.stack([assign_to_centroids(vectors[:, m * width:(m + 1) * width], self.codebook[m])
+                         for m in range(len(self.codebook))], axis=1).astype(np.uint8)
+
+    def add(self, vectors):
+        super().add(vectors)
+        self.codes = np.asfortranarray(self.codes)
+
+    def approximate_distances(self, faces):
+        subspaces, _, width = self.codebook.shape
+        distances = np.zeros((len(faces), len(self.codes)), dtype=np.float32)
+        for i, face in enumerate(faces):
+            # Squared distance from each part of the face to every centroid of its subspace
+            table = ((face.reshape(subspaces, 1, width) - self.codebook) ** 2).sum(axis=2).astype(np.float32)
+            for m in range(subspaces):
+                distances[i] += np.take(table[m], self.codes[:, m])
+        return distances
+
+
+INDEX_TYPES = {"int8": Int8Index, "pq": PQIndex}
+PRECISIONS = tuple(GALLERY_DTYPES) + tuple(INDEX_TYPES)
+
+
+# The codes are persisted next to the database as face_data.int8.npz or face_data.pq.npz
+def quantized_index_path(db_path, precision):
+    return f"{os.path.splitext(db_path)[0]}.{precision}.npz"
+
+
+# Open the persisted compressed codes for a gallery, bringing them up to date first
+# Like ann_index.open_index: appended rows are encoded incrementally, and the quantizer is
+# refitted when the gallery was rebuilt or has grown well past the size it was fitted on
+def open_quantized_index(db_path, gallery, precision):
+    if len(gallery) == 0:
+        return None
+
+    path = quantized_index_path(db_path, precision)
+    index = None
+    if os.path.exists(path):
+        try:
+            index = QuantizedIndex.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable quantized index {path}: {e}")
+
+    if (index is None or index.kind != precision or index.build_id != str(gallery.build_id)
+            or len(index) > len(gallery) or len(gallery) > RETRAIN_GROWTH * index.trained_size):
+        print(f"Encoding {len(gallery)} gallery templates as {precision}...")
+        index = INDEX_TYPES[precision].train(gallery)
+        index.save(path)
+    elif len(index) < len(gallery):
+        index.add(gallery.encodings[len(index):])
+        index.save(path)
+
+    return index
@@ -0,0 +1,299 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import cv2
+import numpy as np
+from .face_models import face_recognition
+from .face_db import init_db
+from .face_matcher import DEFAULT_PRECISION, DEFAULT_THRESHOLD, identify_faces
+from .gallery_reload import GalleryReloader
+from .quantized_index import PRECISIONS
+from .metrics import DISABLED, start_metrics
+
+DEFAULT_PORT = 8765
+MAX_BATCH_SIZE = 16  # Requests processed together at most
+MAX_BATCH_WAIT = 0.005  # Seconds the first request of a batch waits for others to join it
+MAX_QUEUED = 64  # Requests waiting for a batch; more are rejected with 503
+REQUEST_TIMEOUT = 10.0  # Seconds a request may take before it gets a 504
+MAX_BODY_BYTES = 16 * 1024 * 1024
+CNN_BATCH_SIZE = 32  # Frames per batch_face_locations call
+
+
+# One frame (or pre-cropped face) waiting for recognition
+class RecognitionRequest:
+    def __init__(self, rgb_img, cropped):
+        self.rgb_img = rgb_img
+        self.cropped = cropped
+        self.done = threading.Event()
+        self.faces = None
+        self.error = None
+
+
+# Coalesces concurrent requests into micro-batches
+# The first request a worker takes waits at most max_wait for up to max_batch - 1 more.
+# The batch is then detected, encoded and matched together: the gallery is scanned once
+# with one matrix multiply for every face in the batch, and with the CNN model detection
+# runs through batch_face_locations for same-sized frames. The queue is bounded; submit()
+# returns False when it is full so callers can shed load instead of piling up latency.
+class MicroBatcher:
+    def __init__(self, reloader, max_batch=MAX_BATCH_SIZE, max_wait=MAX_BATCH_WAIT, max_queued=MAX_QUEUED,
+                 workers=1, model="hog", threshold=DEFAULT_THRESHOLD, metrics=DISABLED):
+        self.reloader = reloader
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.model = model
+        self.threshold = threshold
+        self.metrics = metrics
+        self.requests = queue.Queue(max_queued)
+        self.workers = [threading.Thread(target=self.run_worker, daemon=True) for _ in range(workers)]
+        self.stopped = threading.Event()
+        self.stats_lock = threading.Lock()
+        self.batches = 0
+        self.processed = 0
+        self.rejected = 0
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        self.stopped.set()
+        for worker in self.workers:
+            worker.join(timeout=5.0)
+
+    def submit(self, request):
+        try:
+            self.requests.put_nowait(request)
+            return True
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected += 1
+            return False
+
+    # Block for the first request, then gather more until the batch is full or max_wait has passed
+    def next_batch(self):
+        try:
+            batch = [self.requests.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run_worker(self):
+        while not self.stopped.is_set():
+            batch = self.next_batch()
+            if not batch:
+                continue
+            try:
+                with self.metrics.stage("batch"):
+                    self.process_batch(batch)
+            except Exception as e:
+                print(f"Error processing a batch of {len(batch)} requests: {e}")
+                for request in batch:
+                    request.error = str(e)
+            with self.stats_lock:
+                self.batches += 1
+                self.processed += len(batch)
+            self.metrics.count("batched_requests", len(batch))
+            for request in batch:
+                request.done.set()
+
+    def process_batch(self, batch):
+        # Detection: crops are one face each; whole frames go through the detector
+        with self.metrics.stage("detect"):
+            locations = iter(self.detect([request for request in batch if not request.cropped]))
+            boxes = []
+            for request in batch:
+                if request.cropped:
+                    height, width = request.rgb_img.shape[:2]
+                    boxes.append([(0, width, height, 0)])
+                else:
+                    boxes.append(next(locations))
+
+        # Encoding runs per image (dlib has no cross-image batch), but all faces of an image at once
+        with self.metrics.stage("encode"):
+            encodings = [face_recognition.face_encodings(request.rgb_img, request_boxes) if request_boxes else []
+                         for request, request_boxes in zip(batch, boxes)]
+
+        # Matching: every face of the whole batch against the gallery in one call
+        all_encodings = [encoding for request_encodings in encodings for encoding in request_encodings]
+        gallery, ann_index = self.reloader.current
+        with self.metrics.stage("match"):
+            matches = identify_faces(gallery, all_encodings, self.threshold, index=ann_index)
+
+        matches = iter(matches)
+        for request, request_boxes, request_encodings in zip(batch, boxes, encodings):
+            request.faces = []
+            for box, _ in zip(request_boxes, request_encodings):
+                name, user_id, distance = next(matches)
+                request.faces.append({"box": [int(v) for v in box], "name": name, "id": user_id,
+                                      "distance": None if distance is None else round(float(distance), 4)})
+            self.metrics.frame(len(request.faces))
+
+    # face_locations for every frame; with the CNN model same-sized frames are detected together
+    def detect(self, requests):
+        if self.model != "cnn":
+            return [face_recognition.face_locations(request.rgb_img) for request in requests]
+
+        locations = [None] * len(requests)
+        by_shape = {}
+        for i, request in enumerate(requests):
+            by_shape.setdefault(request.rgb_img.shape, []).append(i)
+        for indices in by_shape.values():
+            frames = [requests[i].rgb_img for i in indices]
+            for i, found in zip(indices, face_recognition.batch_face_locations(frames, batch_size=CNN_BATCH_SIZE)):
+                locations[i] = found
+        return locations
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "queued": self.requests.qsize(),
+                "processed": self.processed,
+                "batches": self.batches,
+                "mean_batch_size": self.processed / self.batches if self.batches else 0.0,
+                "rejected": self.rejected,
+            }
+
+
+# Connections are accepted into a deep listen backlog and served by one thread each;
+# overload is signalled by the batcher with 503s rather than by refused connections
+class ServiceHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+# HTTP front end
+#   POST /recognize        body: a JPEG/PNG frame; every face in it is detected and identified
+#   POST /recognize?crop=1 body: an already cropped face; the whole image is encoded
+#   GET  /stats            batcher, gallery and metrics stats as JSON
+#   GET  /health           200 once the gallery is loaded
+# Responses are JSON: {"faces": [{"box": [top, right, bottom, left], "name", "id", "distance"}]}
+def make_handler(batcher, reloader, metrics, request_timeout):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                self.send_json(200, {"status": "ok", "templates": len(reloader.current[0])})
+            elif path == "/stats":
+                self.send_json(200, {"batcher": batcher.stats(), "gallery": reloader.stats(),
+                                     "stages": metrics.stats()})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/recognize":
+                self.send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self.send_json(413 if length > 0 else 400, {"error": "expected an image body"})
+                return
+            body = self.rfile.read(length)
+
+            with metrics.stage("decode"):
+                frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                self.send_json(400, {"error": "could not decode the image"})
+                return
+
+            cropped = parse_qs(url.query).get("crop", ["0"])[0] not in ("0", "false", "")
+            request = RecognitionRequest(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), cropped)
+            if not batcher.submit(request):
+                # Backpressure: tell the client to retry rather than queueing without bound
+                self.send_json(503, {"error": "overloaded"}, {"Retry-After": "1"})
+                return
+            if not request.done.wait(request_timeout):
+                self.send_json(504, {"error": "timed out"})
+                return
+            if request.error is not None:
+                self.send_json(500, {"error": request.error})
+                return
+            self.send_json(200, {"faces": request.faces})
+
+        def log_message(self, format, *args):
+            pass  # One line per request would drown the console under load
+
+    return Handler
+
+
+# Run the headless recognition service until interrupted
+def run_service(host="127.0.0.1", port=DEFAULT_PORT, db_path="face_data.db", max_batch=MAX_BATCH_SIZE,
+                max_wait=MAX_BATCH_WAIT, max_queued=MAX_QUEUED, workers=1, model="hog",
+                threshold=DEFAULT_THRESHOLD, request_timeout=REQUEST_TIMEOUT, metrics_port=None, metrics_file=None,
+                gallery_precision=DEFAULT_PRECISION):
+    reloader = GalleryReloader(db_path, precision=gallery_precision)
+    metrics, exporters = start_metrics(metrics_port, metrics_file)
+    batcher = MicroBatcher(reloader, max_batch, max_wait, max_queued, workers, model, threshold, metrics)
+    metrics.gauge("request_queue_depth", batcher.requests.qsize)
+    metrics.gauge("rejected_requests", lambda: batcher.rejected, kind="counter")
+
+    # Bind before starting any thread, so a port that is in use leaves nothing running
+    try:
+        server = ServiceHTTPServer((host, port), make_handler(batcher, reloader, metrics, request_timeout))
+    except OSError as e:
+        print(f"Error: Could not listen on {host}:{port}: {e}")
+        for exporter in exporters:
+            exporter.stop()
+        return
+    reloader.start()
+    batcher.start()
+    print(f"Recognition service listening on http://{host}:{port} "
+          f"(batches of up to {max_batch}, {max_wait * 1000:g} ms wait, {max_queued} queued)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+        reloader.stop()
+        for exporter in exporters:
+            exporter.stop()
+        print(f"Service stats: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless face recognition over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default="face_data.db")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="requests per batch at most")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_BATCH_WAIT * 1000,
+                        help="how long a batch waits to fill up")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED,
+                        help="waiting requests before new ones are rejected with 503")
+    parser.add_argument("--workers", type=int, default=1, help="batches processed in parallel")
+    parser.add_argument("--model", choices=["hog", "cnn"], default="hog")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION,
+                        help="gallery storage; int8 and pq search compressed codes with a float re-rank")
+    parser.add_argument("--metrics-port", type=int, default=None)
+    parser.add_argument("--metrics-file", default=None)
+    args = parser.parse_args()
+
+    init_db(args.db)  # Create or upgrade the database schema
+    run_service(args.host, args.port, args.db, args.max_batch, args.max_wait_ms / 1000, args.max_queued,
+                args.workers, args.model, args.threshold, metrics_port=args.metrics_port,
+                metrics_file=args.metrics_file, gallery_precision=args.precision)
@@ -0,0 +1,106 @@
+import math
+import cv2
+import numpy as np
+from .face_models import face_recognition
+from .face_tracking import detect_faces_scaled
+
+ENROLL_DETECTION_SCALE = 0.5  # The person is close to the camera, so a half-size frame is enough to find the face
+MIN_FACE_SIZE = 100  # Smallest face box side in full-resolution pixels
+BLUR_THRESHOLD = 60.0  # Laplacian variance of the face crop below this is too blurry
+MAX_YAW = 0.35  # Nose offset from the eye midpoint, as a fraction of the eye distance
+MAX_ROLL = 20.0  # Degrees the line between the eyes may tilt
+THUMBNAIL_SIZE = 32  # Side of the normalized grayscale face thumbnail used for novelty
+MIN_NOVELTY = 0.35  # Mean absolute thumbnail difference (in standard deviations) from every accepted sample
+
+
+# Normalized grayscale thumbnail of a face box, comparable across lighting changes
+def face_thumbnail(gray, box):
+    top, right, bottom, left = box
+    thumb = cv2.resize(gray[top:bottom, left:right], (THUMBNAIL_SIZE, THUMBNAIL_SIZE),
+                       interpolation=cv2.INTER_AREA).astype(np.float32)
+    return (thumb - thumb.mean()) / (thumb.std() + 1e-6)
+
+
+# (yaw, roll) estimate from the 5-point landmarks; yaw is the nose offset from the eye midpoint
+# relative to the eye distance, roll the tilt of the eye line in degrees
+def estimate_pose(landmarks):
+    eyes = sorted([np.mean(landmarks["left_eye"], axis=0), np.mean(landmarks["right_eye"], axis=0)],
+                  key=lambda point: point[0])
+    nose = np.mean(landmarks["nose_tip"], axis=0)
+    eye_vector = eyes[1] - eyes[0]
+    eye_distance = max(float(np.hypot(*eye_vector)), 1e-6)
+    yaw = float(nose[0] - (eyes[0][0] + eyes[1][0]) / 2) / eye_distance
+    roll = math.degrees(math.atan2(eye_vector[1], eye_vector[0]))
+    return yaw, roll
+
+
+# Picks enrollment frames worth encoding
+# Each frame goes through increasingly expensive checks and stops at the first failure:
+# one face found on a downscaled frame, face size, Laplacian blur, pose from the 5-point
+# landmarks, then difference from the samples already accepted. Only frames that pass all
+# of them are handed to face_encodings, so rejected frames never pay for the embedding and
+# the stored templates are sharp, frontal and not near-copies of each other.
+class SampleSelector:
+    def __init__(self, min_face_size=MIN_FACE_SIZE, blur_threshold=BLUR_THRESHOLD, max_yaw=MAX_YAW,
+                 max_roll=MAX_ROLL, min_novelty=MIN_NOVELTY, detection_scale=ENROLL_DETECTION_SCALE):
+        self.min_face_size = min_face_size
+        self.blur_threshold = blur_threshold
+        self.max_yaw = max_yaw
+        self.max_roll = max_roll
+        self.min_novelty = min_novelty
+        self.detection_scale = detection_scale
+        self.accepted = []  # Thumbnails of accepted samples
+        self.candidate = None  # Thumbnail of the frame select() last passed
+        self.last_reason = None  # Why the last frame was rejected, for on-screen feedback
+        self.rejections = {}
+        self.frames = 0
+
+    # Face box (top, right, bottom, left) when the frame is worth encoding, otherwise None
+    # Call accept() once the encoding for that box has been stored
+    def select(self, frame, rgb_img):
+        self.frames += 1
+        self.candidate = None
+
+        boxes = detect_faces_scaled(rgb_img, self.detection_scale)
+        if not boxes:
+            return self.reject("no face")
+        if len(boxes) > 1:
+            return self.reject("more than one face")
+        box = boxes[0]
+        top, right, bottom, left = box
+
+        if min(bottom - top, right - left) < self.min_face_size:
+            return self.reject("move closer")
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if cv2.Laplacian(gray[top:bottom, left:right], cv2.CV_64F).var() < self.blur_threshold:
+            return self.reject("too blurry, hold still")
+
+        landmarks = face_recognition.face_landmarks(rgb_img, [box], model="small")
+        if not landmarks:
+            return self.reject("no face")
+        yaw, roll = estimate_pose(landmarks[0])
+        if abs(yaw) > self.max_yaw or abs(roll) > self.max_roll:
+            return self.reject("face the camera")
+
+        thumbnail = face_thumbnail(gray, box)
+        if any(np.mean(np.abs(thumbnail - other)) < self.min_novelty for other in self.accepted):
+            return self.reject("too similar, move slightly")
+
+        self.candidate = thumbnail
+        self.last_reason = None
+        return box
+
+    # Record the last selected frame as an accepted sample
+    def accept(self):
+        if self.candidate is not None:
+            self.accepted.append(self.candidate)
+            self.candidate = None
+
+    def reject(self, reason):
+        self.last_reason = reason
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        return None
+
+    def stats(self):
+        return {"frames": self.frames, "accepted": len(self.accepted), "rejections": dict(self.rejections)}
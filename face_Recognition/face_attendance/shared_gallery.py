@@ -0,0 +1,200 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import numpy as np
+from .encoding_format import ENCODING_SIZE
+from .face_matcher import squared_norms
+from .gallery_reload import GalleryReloader
+from .gallery_snapshot import replace_file
+
+SHARED_GALLERY_MAGIC = b"FACEGAL1"
+SHARED_GALLERY_VERSION = 2  # 2: float32 encodings
+ALIGNMENT = 64  # Arrays start on cache-line boundaries
+PUBLISH_INTERVAL = 1.0  # Seconds between checks for a newer gallery in the publisher loop
+
+# magic, layout version, encoding size, templates, identities, id bytes, name bytes, publish count, build_id
+HEADER = struct.Struct("<8sIIQQQQQ32s")
+
+
+# Shared galleries live in /dev/shm (RAM-backed) when the system has it, so publishing
+# never touches the disk; elsewhere they fall back to the temp directory
+def shared_gallery_path(name="face_gallery"):
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"{name}.shared")
+
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Array layout after the header: (name, dtype, length) in file order
+def array_layout(templates, identities, id_bytes, name_bytes):
+    return [
+        ("encodings", np.float32, templates * ENCODING_SIZE),
+        ("sq_norms", np.float64, templates),
+        ("template_identity", np.int64, templates),
+        ("group_order", np.int64, templates),
+        ("group_counts", np.int64, identities),
+        ("group_starts", np.int64, identities),
+        ("id_offsets", np.int64, identities + 1),
+        ("name_offsets", np.int64, identities + 1),
+        ("id_bytes", np.uint8, id_bytes),
+        ("name_bytes", np.uint8, name_bytes),
+    ]
+
+
+# UTF-8 strings packed into one byte array plus offsets: string i is data[offsets[i]:offsets[i + 1]]
+def pack_strings(strings):
+    encoded = [str(s).encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+# Read-only view of packed strings; strings are decoded only when a match is reported,
+# so workers never hold a Python string per identity
+class StringTable:
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+# Write gallery, with its identity grouping precomputed, to path
+# The file is written next to the old one and renamed into place, so a worker that has the
+# old file mapped keeps reading it intact and a worker opening the path always gets a
+# complete file; the old file's memory is freed when its last worker lets go of it.
+def publish_gallery(gallery, path=None, publish_count=0):
+    path = path or shared_gallery_path()
+    id_bytes, id_offsets = pack_strings(gallery.identity_ids)
+    name_bytes, name_offsets = pack_strings(gallery.identity_names)
+    # Encodings are shared as float32; norms are recomputed when that rounds a float64 gallery
+    encodings = np.ascontiguousarray(gallery.encodings, dtype=np.float32)
+    sq_norms = gallery.sq_norms if gallery.encodings.dtype == np.float32 else squared_norms(encodings)
+    arrays = {
+        "encodings": encodings,
+        "sq_norms": sq_norms,
+        "template_identity": gallery.template_identity,
+        "group_order": gallery.group_order,
+        "group_counts": gallery.group_counts,
+        "group_starts": gallery.group_starts,
+        "id_offsets": id_offsets,
+        "name_offsets": name_offsets,
+        "id_bytes": id_bytes,
+        "name_bytes": name_bytes,
+    }
+    build_id = str(gallery.build_id or "").encode("ascii")[:32]
+    header = HEADER.pack(SHARED_GALLERY_MAGIC, SHARED_GALLERY_VERSION, ENCODING_SIZE, len(gallery),
+                         len(gallery.identity_ids), len(id_bytes), len(name_bytes), publish_count, build_id)
+
+    def write(file):
+        file.write(header)
+        offset = HEADER.size
+        for name, dtype, _ in array_layout(len(gallery), len(gallery.identity_ids), len(id_bytes), len(name_bytes)):
+            start = aligned(offset)
+            file.write(b"\0" * (start - offset))
+            data = np.ascontiguousarray(arrays[name], dtype=dtype).reshape(-1)
+            file.write(data.tobytes())
+            offset = start + data.nbytes
+
+    replace_file(path, write)
+    return path
+
+
+# Gallery backed by a mapped shared file; has everything face_matcher and ann_index need
+# All arrays are read-only views into the mapping, so each extra worker costs no gallery memory
+class SharedGallery:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = os.fstat(file.fileno()).st_ino
+
+        (magic, version, dim, templates, identities, id_bytes, name_bytes, self.publish_count,
+         build_id) = HEADER.unpack_from(self.map, 0)
+        if magic != SHARED_GALLERY_MAGIC or version != SHARED_GALLERY_VERSION or dim != ENCODING_SIZE:
+            raise ValueError(f"{path} is not a version {SHARED_GALLERY_VERSION} shared gallery")
+        self.build_id = build_id.rstrip(b"\0").decode("ascii") or None
+
+        offset = HEADER.size
+        arrays = {}
+        for name, dtype, length in array_layout(templates, identities, id_bytes, name_bytes):
+            start = aligned(offset)
+            arrays[name] = np.frombuffer(self.map, dtype=dtype, count=length, offset=start)
+            offset = start + arrays[name].nbytes
+
+        self.encodings = arrays["encodings"].reshape(templates, ENCODING_SIZE)
+        self.sq_norms = arrays["sq_norms"]
+        self.template_identity = arrays["template_identity"]
+        self.group_order = arrays["group_order"]
+        self.group_counts = arrays["group_counts"]
+        self.group_starts = arrays["group_starts"]
+        self.identity_ids = StringTable(arrays["id_bytes"], arrays["id_offsets"])
+        self.identity_names = StringTable(arrays["name_bytes"], arrays["name_offsets"])
+
+    def __len__(self):
+        return len(self.encodings)
+
+
+# Worker side: the current shared gallery, reopened whenever the publisher renames a new one into place
+# gallery() costs one stat() when nothing changed
+class SharedGalleryReader:
+    def __init__(self, path=None):
+        self.path = path or shared_gallery_path()
+        self.current = SharedGallery(self.path)
+        self.reopens = 0
+
+    def gallery(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return self.current  # Being replaced right now; keep the old one
+        if inode != self.current.inode:
+            try:
+                self.current = SharedGallery(self.path)
+                self.reopens += 1
+            except (OSError, ValueError) as e:
+                print(f"Error opening shared gallery {self.path}: {e}")
+        return self.current
+
+
+def remove_shared_gallery(path=None):
+    try:
+        os.remove(path or shared_gallery_path())
+    except FileNotFoundError:
+        pass
+
+
+# Keep the shared gallery in step with the database until interrupted
+# A GalleryReloader follows enrollments; every new gallery it produces is published
+def run_publisher(db_path="face_data.db", path=None, interval=PUBLISH_INTERVAL):
+    path = path or shared_gallery_path()
+    reloader = GalleryReloader(db_path)
+    reloader.start()
+    published = None
+    publish_count = 0
+    try:
+        while True:
+            gallery, _ = reloader.current
+            if gallery is not published:
+                publish_count += 1
+                publish_gallery(gallery, path, publish_count)
+                published = gallery
+                print(f"Published {len(gallery)} templates to {path} (version {publish_count})")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reloader.stop()
+        remove_shared_gallery(path)
+
+
+if __name__ == "__main__":
+    run_publisher(sys.argv[1] if len(sys.argv) > 1 else "face_data.db")
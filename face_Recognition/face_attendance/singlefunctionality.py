@@ -0,0 +1,109 @@
+import cv2
+from .face_models import face_recognition
+from .attendance_dedup import CONFIRM_COOLDOWN, AttendanceDeduper, PendingConfirmations
+from .attendance_log import AttendanceLogWriter
+from .face_db import init_db
+from .face_matcher import identify_faces
+from .gallery_reload import GalleryReloader
+from .metrics import start_metrics
+
+# Recognize faces and log when confirmation is given
+# cooldown is how many seconds pass before a confirmed or skipped person is asked about again
+# live_reload picks up enrollments, removals and renames without restarting
+# metrics_port serves per-stage latencies and counters at http://127.0.0.1:<port>/metrics;
+# metrics_file rewrites the same text every few seconds. With neither, nothing is measured
+def recognize_and_log_face(cooldown=CONFIRM_COOLDOWN, live_reload=True, metrics_port=None, metrics_file=None):
+    # Open the webcam first, so nothing else has been started if it is unavailable
+    cam = cv2.VideoCapture(0)
+    if not cam.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+
+    # Open stored face encodings, names and IDs from the memory-mapped gallery snapshot;
+    # large galleries also get an approximate index, small ones scan everything
+    # The reloader merges people enrolled while this runs into a new gallery in the background
+    reloader = GalleryReloader("face_data.db")
+    if live_reload:
+        reloader.start()
+
+    # Recognitions are queued and written in batches on a background thread
+    metrics, exporters = start_metrics(metrics_port, metrics_file)
+    attendance_log = AttendanceLogWriter("face_data.db", csv_path="recognition_log.csv", metrics=metrics)
+    attendance_log.start()
+    metrics.gauge("log_queue_depth", attendance_log.events.qsize)
+
+    cv2.namedWindow("Face Recognition")
+    recognition_threshold = 0.6  # Confidence threshold
+
+    # Recognitions wait here for the operator; the video keeps running meanwhile
+    deduper = AttendanceDeduper(cooldown)
+    confirmations = PendingConfirmations(deduper)
+
+    while True:
+        with metrics.stage("read"):
+            ret, frame = cam.read()
+        if not ret:
+            print("Failed to grab frame. Exiting...")
+            break
+
+        with metrics.stage("convert"):
+            rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with metrics.stage("detect"):
+            face_locations = face_recognition.face_locations(rgb_img)
+        with metrics.stage("encode"):
+            face_encodings = face_recognition.face_encodings(rgb_img, face_locations)
+
+        # Compare every face in the frame against the whole gallery in one batch
+        gallery, ann_index = reloader.current
+        with metrics.stage("match"):
+            matches = identify_faces(gallery, face_encodings, recognition_threshold, index=ann_index)
+        metrics.frame(len(face_locations))
+
+        for (top, right, bottom, left), (name, user_id, best_match_distance) in zip(face_locations, matches):
+            if user_id is not None:
+                # Display the face rectangle and name
+                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+                # Ask for confirmation unless this person is already waiting or was handled recently
+                if confirmations.offer(name, user_id):
+                    print(f"Recognized {name} (ID: {user_id}), press Enter to log or Backspace to skip")
+
+            else:
+                name = "Unknown"
+                user_id = None
+                cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
+                cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+
+        # Show the oldest recognition still waiting for confirmation
+        waiting = confirmations.current()
+        if waiting is not None:
+            prompt = f"Log {waiting[0]}? Enter = yes, Backspace = no ({len(confirmations)} waiting)"
+            cv2.putText(frame, prompt, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+        with metrics.stage("display"):
+            cv2.imshow("Face Recognition", frame)
+            key = cv2.waitKey(1) % 256
+        if key == 27:  # ESC key
+            break
+        if key == 13:  # Enter key to log
+            confirmed = confirmations.confirm()
+            if confirmed is not None:
+                attendance_log.log(*confirmed)
+                print(f"Logged {confirmed[0]} (ID: {confirmed[1]})")
+        elif key == 8:  # Backspace to skip
+            dismissed = confirmations.dismiss()
+            if dismissed is not None:
+                print(f"Skipped logging {dismissed[0]}")
+
+    attendance_log.close()  # Write any queued attendance events
+    reloader.stop()
+    for exporter in exporters:
+        exporter.stop()
+    cam.release()
+    cv2.destroyAllWindows()
+
+# Run the face recognition system
+if __name__ == "__main__":
+    init_db()  # Create or upgrade the database schema
+    recognize_and_log_face()
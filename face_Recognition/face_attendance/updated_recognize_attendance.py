@@ -0,0 +1,164 @@
+import cv2
+import threading
+from .attendance_dedup import AUTO_LOG_COOLDOWN, AttendanceDeduper
+from .attendance_log import AttendanceLogWriter
+from .encoding_cache import EncodingCache
+from .face_db import init_db
+from .frame_recognition import FrameOrder, detect_and_identify, draw_faces
+from .face_matcher import DEFAULT_PRECISION
+from .gallery_reload import GalleryReloader
+from .pipeline import RecognitionPipeline
+from .face_tracking import DETECTION_SCALE, DETECT_EVERY, FaceTracker
+from .frame_gate import FrameGate
+from .identity_cache import REVERIFY_INTERVAL, IdentityCache
+from .metrics import start_metrics
+
+# use_pipeline runs capture, inference and display on separate threads so the
+# video never waits for detection; inference_workers sets the size of the worker pool
+# detection_scale and detect_every control downscaled detection with tracking in between;
+# use_tracking=False runs full-resolution detection on every frame as before
+# reverify_interval is how long a confidently recognized track keeps its identity without re-encoding
+# use_gate skips dlib on frames with no motion or no Haar cascade face candidates; the cascade
+# misses some faces dlib would find (profile views, low light), so this trades recall for speed,
+# and while the scene is live one frame per second (frame_gate.FORCE_INTERVAL) still gets full
+# detection to bound the loss; a static empty scene never runs dlib
+# use_encoding_cache reuses encodings of face crops that have not changed (fixed cameras, people standing still)
+# log_cooldown is how many seconds pass before the same person is logged again
+# live_reload picks up enrollments, removals and renames without restarting
+# metrics_port serves per-stage latencies and counters at http://127.0.0.1:<port>/metrics;
+# metrics_file rewrites the same text every few seconds. With neither, nothing is measured
+# gallery_precision stores the gallery as "float32" or "float64" rows, or searches it through
+# "int8" or "pq" compressed codes with a float re-rank (see quantized_index.py)
+# db_path is the database the gallery is read from and attendance is written to
+def recognize_and_log_face(use_pipeline=False, inference_workers=2, use_tracking=True,
+                           detection_scale=DETECTION_SCALE, detect_every=DETECT_EVERY,
+                           reverify_interval=REVERIFY_INTERVAL, use_gate=True, use_encoding_cache=False,
+                           log_cooldown=AUTO_LOG_COOLDOWN, live_reload=True, metrics_port=None,
+                           metrics_file=None, gallery_precision=DEFAULT_PRECISION, db_path="face_data.db"):
+    # Open the webcam first, so nothing else has been started if it is unavailable
+    cam = cv2.VideoCapture(0)
+    if not cam.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+
+    # Open stored face encodings, names and IDs from the memory-mapped gallery snapshot;
+    # large galleries also get an approximate index, small ones scan everything
+    # The reloader merges people enrolled while this runs into a new gallery in the background
+    reloader = GalleryReloader(db_path, precision=gallery_precision)
+    if live_reload:
+        reloader.start()
+
+    # Recognitions are queued and written in batches on a background thread
+    metrics, exporters = start_metrics(metrics_port, metrics_file)
+    attendance_log = AttendanceLogWriter(db_path, csv_path="recognition_log.csv", metrics=metrics)
+    attendance_log.start()
+    metrics.gauge("log_queue_depth", attendance_log.events.qsize)
+
+    cv2.namedWindow("Face Recognition")
+    recognition_threshold = 0.6  # Confidence threshold
+
+    deduper = AttendanceDeduper(log_cooldown)  # Per-person cooldown so alternating people are not logged over and over
+
+    # The tracker and gate keep state across frames, so pipeline workers take turns updating them
+    tracker = FaceTracker(detection_scale, detect_every) if use_tracking else None
+    identity_cache = IdentityCache(reverify_interval=reverify_interval) if use_tracking else None
+    gate = FrameGate() if use_gate else None
+    encoding_cache = EncodingCache() if use_encoding_cache else None
+    state_lock = threading.Lock()
+    frame_order = FrameOrder() if use_pipeline else None  # Workers may finish frames out of order
+
+    def process_frame(frame, seq=None):
+        gallery, ann_index = reloader.current  # One consistent pair per frame, even mid-reload
+        with metrics.stage("inference"):
+            faces = detect_and_identify(frame, gallery, ann_index, recognition_threshold, tracker, state_lock,
+                                        identity_cache, gate, metrics, encoding_cache, frame_order, seq)
+        if faces is not None:
+            metrics.frame(len(faces))
+        return faces
+
+    def log_faces(faces):
+        for _, (name, user_id, best_match_distance) in faces:
+            if user_id is not None:
+                print(f"Recognized {name} (ID: {user_id})")
+
+                # Log each person at most once per cooldown window
+                if deduper.check_and_mark(user_id):
+                    attendance_log.log(name, user_id)
+            else:
+                print("Face not recognized.")
+
+    if use_pipeline:
+        pipeline = RecognitionPipeline(cam, process_frame, inference_workers)
+        pipeline.start()
+        metrics.gauge("dropped_frames", lambda: pipeline.grabber.dropped + pipeline.inference_queue.dropped,
+                      kind="counter")
+        metrics.gauge("inference_queue_depth", lambda: len(pipeline.inference_queue))
+
+    while True:
+        if use_pipeline:
+            with metrics.stage("read"):
+                item = pipeline.next_frame(timeout=1.0)
+            if item is None:
+                if pipeline.failed:
+                    print("Failed to grab frame. Exiting...")
+                    break
+                continue
+
+            # Show the freshest frame with the latest finished results, and log every finished result
+            _, frame = item
+            frame = frame.copy()
+            _, faces = pipeline.latest_result()
+            new_faces = [face for _, result in pipeline.finished_results() for face in result]
+        else:
+            with metrics.stage("read"):
+                ret, frame = cam.read()
+            if not ret:
+                print("Failed to grab frame. Exiting...")
+                break
+
+            faces = process_frame(frame)
+            new_faces = faces
+
+        log_faces(new_faces)
+
+        # Display the frame
+        with metrics.stage("display"):
+            draw_faces(frame, faces)
+            cv2.imshow("Face Recognition", frame)
+            key = cv2.waitKey(1) % 256
+
+        # Wait for the ESC key to exit the loop
+        if key == 27: # ESC key
+            break
+
+    if use_pipeline:
+        pipeline.stop()
+        log_faces([face for _, result in pipeline.finished_results() for face in result])
+        print(f"Pipeline stats: {pipeline.stats()}")
+    if tracker is not None:
+        print(f"Tracker stats: {tracker.stats()}")
+        print(f"Identity cache stats: {identity_cache.stats()}")
+    if gate is not None:
+        print(f"Gate stats: {gate.stats()}")
+    if encoding_cache is not None:
+        print(f"Encoding cache stats: {encoding_cache.stats()}")
+
+    # Write any queued attendance events before exiting
+    attendance_log.close()
+    print(f"Attendance log stats: {attendance_log.stats()}")
+    print(f"Dedup stats: {deduper.stats()}")
+    reloader.stop()
+    print(f"Gallery reload stats: {reloader.stats()}")
+    if metrics.enabled:
+        print(f"Stage latencies: {metrics.stats()}")
+    for exporter in exporters:
+        exporter.stop()
+
+    # Release resources
+    cam.release()
+    cv2.destroyAllWindows()
+
+# Run the function
+if __name__ == "__main__":
+    init_db()  # Create or upgrade the database schema
+    recognize_and_log_face()
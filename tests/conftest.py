@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "face_Recognition")
+
+# The tests import face_attendance from the source tree, installed or not
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
+
+
+# A fresh, fully migrated database per test; its gallery snapshot files land next to it
+@pytest.fixture
+def db_path(tmp_path):
+    from face_attendance.face_db import close_connection, init_db
+
+    path = str(tmp_path / "face_data.db")
+    init_db(path)
+    yield path
+    close_connection(path)
@@ -0,0 +1,61 @@
+import csv
+
+from face_attendance.attendance_dedup import AttendanceDeduper
+from face_attendance.attendance_log import AttendanceLogWriter
+from face_attendance.face_db import get_connection
+
+
+def test_dedup_suppresses_within_cooldown():
+    deduper = AttendanceDeduper(cooldown=60)
+    assert deduper.check_and_mark("1", now=0)
+    assert not deduper.check_and_mark("1", now=59.9)
+    assert deduper.check_and_mark("2", now=30)
+    assert deduper.check_and_mark("1", now=60)  # The window is over at exactly cooldown seconds
+    assert not deduper.check_and_mark("2", now=60)
+    assert (deduper.logged, deduper.suppressed) == (3, 2)
+
+
+# Many people inside one window: nobody is forgotten before their cooldown ends
+def test_dedup_keeps_every_id_inside_its_cooldown():
+    deduper = AttendanceDeduper(cooldown=300)
+    for number in range(5000):
+        assert deduper.check_and_mark(str(number), now=number * 0.01)
+    assert deduper.in_cooldown("0", now=299)
+    assert not deduper.in_cooldown("0", now=300)
+
+
+def read_attendance(db_path):
+    return get_connection(db_path).execute("SELECT user_id, name, recognized_at FROM attendance "
+                                           "ORDER BY event_id").fetchall()
+
+
+# Events queued before the thread runs are written in batch_size batches, CSV rows included
+def test_writer_batches_queued_events(db_path, tmp_path):
+    csv_path = str(tmp_path / "recognition_log.csv")
+    writer = AttendanceLogWriter(db_path, csv_path=csv_path, batch_size=10, flush_interval=60)
+    for number in range(25):
+        writer.log(f"Person {number}", str(number), "2024-01-31 08:00:00")
+    writer.start()
+    writer.close()
+
+    assert writer.stats() == {"queued": 0, "written": 25, "batches": 3, "failed": 0, "csv_failed": 0}
+    assert len(read_attendance(db_path)) == 25
+    with open(csv_path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["Person 0", "0", "2024-01-31 08:00:00"]
+    assert len(rows) == 25
+
+
+# close() writes what is queued; events logged after it are written at once instead of lost
+def test_writer_close_path(db_path):
+    writer = AttendanceLogWriter(db_path, flush_interval=60)
+    writer.start()
+    writer.log("Ann", "1", "2024-01-31 08:00:00")
+    writer.close()
+    assert not writer.is_alive()
+    assert read_attendance(db_path) == [("1", "Ann", "2024-01-31 08:00:00")]
+
+    writer.log("Bob", "2", "2024-01-31 08:05:00")
+    writer.close()  # A second close is harmless
+    assert read_attendance(db_path)[-1] == ("2", "Bob", "2024-01-31 08:05:00")
+    assert writer.stats()["written"] == 2
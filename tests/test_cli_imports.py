@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "face_Recognition")
+
+# Runs one CLI command in a fresh interpreter and prints the heavy modules it imported
+CHECK_IMPORTS = """
+import sys
+sys.path.insert(0, {source_dir!r})
+from face_attendance import attendance_cli
+attendance_cli.main({argv!r})
+print(sorted(name for name in ("cv2", "face_recognition", "dlib") if name in sys.modules))
+"""
+
+
+# Database-only commands must not import OpenCV or load the face models
+@pytest.mark.parametrize("argv", [
+    ["init-db", "--db", "attendance.db"],
+    ["people", "--db", "attendance.db"],
+    ["export", "events.csv", "--db", "attendance.db"],
+])
+def test_database_commands_do_not_import_opencv(tmp_path, argv):
+    script = CHECK_IMPORTS.format(source_dir=SOURCE_DIR, argv=argv)
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from face_attendance.face_matcher import Gallery, identify_faces, match_faces
+
+
+# A 128-d vector with value at position index and zeros elsewhere
+def vector(index, value):
+    encoding = np.zeros(128)
+    encoding[index] = value
+    return encoding
+
+
+# A face exactly at the threshold is Unknown; anything closer is a match
+def test_threshold_is_exclusive():
+    gallery = Gallery([vector(0, 0.0)], ["1"], ["Ann"], dtype=np.float64)
+    face = vector(1, 0.6)
+    distance = match_faces(gallery, [face])[0][0][2]
+
+    assert identify_faces(gallery, [face], threshold=distance) == [("Unknown", None, distance)]
+    assert identify_faces(gallery, [face], threshold=np.nextafter(distance, 1.0)) == [("Ann", "1", distance)]
+
+
+def test_empty_gallery_is_unknown():
+    gallery = Gallery(np.empty((0, 128)), [], [], dtype=np.float64)
+    assert identify_faces(gallery, [vector(0, 1.0)]) == [("Unknown", None, None)]
+    assert identify_faces(gallery, []) == []
+
+
+# Ann has a close and a far template, listed apart; Bob has one template in between
+# min takes Ann's closest template, mean averages hers to 0.5 and loses to Bob's 0.4
+@pytest.mark.parametrize("reduce, expected", [("min", ("Ann", "1", 0.1)), ("mean", ("Bob", "2", 0.4))])
+def test_templates_are_grouped_per_identity(reduce, expected):
+    gallery = Gallery([vector(0, 0.1), vector(1, 0.4), vector(2, 0.9)], ["1", "2", "1"], ["Ann", "Bob", "Ann"],
+                      dtype=np.float64)
+    (name, user_id, distance), = identify_faces(gallery, [np.zeros(128)], reduce=reduce)
+
+    assert (name, user_id) == expected[:2]
+    assert distance == pytest.approx(expected[2])
+    assert list(gallery.identity_ids) == ["1", "2"]
+    assert list(gallery.group_counts) == [2, 1]
+
+
+def test_unknown_reduction_is_rejected():
+    gallery = Gallery([vector(0, 0.1)], ["1"], ["Ann"])
+    with pytest.raises(ValueError):
+        identify_faces(gallery, [np.zeros(128)], reduce="max")
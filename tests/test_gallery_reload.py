@@ -0,0 +1,86 @@
+import numpy as np
+
+from face_attendance.encoding_format import ENCODING_FORMAT_VERSION, encode_encodings
+from face_attendance.face_db import get_connection, transaction
+from face_attendance.face_matcher import identify_faces
+from face_attendance.gallery_reload import GalleryReloader
+from face_attendance.gallery_snapshot import open_gallery, update_snapshot
+
+
+def vector(index, value=0.5):
+    encoding = np.zeros(128)
+    encoding[index] = value
+    return encoding
+
+
+# Enroll one person with one template, the way the capture scripts write them
+def enroll(db_path, user_id, name, index):
+    with transaction(get_connection(db_path)) as cursor:
+        cursor.execute("INSERT INTO faces (id, name) VALUES (?, ?)", (user_id, name))
+        cursor.execute("INSERT INTO face_templates (user_id, encoding, encoding_format) VALUES (?, ?, ?)",
+                       (user_id, encode_encodings(vector(index).reshape(1, 128)), ENCODING_FORMAT_VERSION))
+
+
+def execute(db_path, sql, params=()):
+    with transaction(get_connection(db_path)) as cursor:
+        cursor.execute(sql, params)
+
+
+def test_snapshot_appends_new_people(db_path):
+    enroll(db_path, "1", "Ann", 0)
+    build_id = open_gallery(db_path).build_id
+    assert update_snapshot(db_path) == "fresh"
+
+    enroll(db_path, "2", "Bob", 1)
+    assert update_snapshot(db_path) == "appended"
+    gallery = open_gallery(db_path)
+    assert list(gallery.ids) == ["1", "2"]
+    assert gallery.build_id == build_id
+
+
+# Renames and deletions change neither the newest rowid nor (for a rename) the row count,
+# so the change log is what makes the snapshot stale
+def test_snapshot_rebuilds_after_rename_and_delete(db_path):
+    enroll(db_path, "1", "Ann", 0)
+    enroll(db_path, "2", "Bob", 1)
+    build_id = open_gallery(db_path).build_id
+
+    execute(db_path, "UPDATE faces SET name = 'Robert' WHERE id = '2'")
+    assert update_snapshot(db_path) == "rebuilt"
+    gallery = open_gallery(db_path)
+    assert list(gallery.names) == ["Ann", "Robert"]
+    assert gallery.build_id != build_id
+
+    execute(db_path, "DELETE FROM face_templates WHERE user_id = '1'")
+    execute(db_path, "DELETE FROM faces WHERE id = '1'")
+    assert update_snapshot(db_path) == "rebuilt"
+    gallery = open_gallery(db_path)
+    assert list(gallery.ids) == ["2"]
+    assert identify_faces(gallery, [vector(0)])[0][:2] == ("Unknown", None)
+
+
+# The reloader merges enrollments, renames and deletions from gallery_changes without a full load
+def test_reloader_merges_logged_changes(db_path):
+    enroll(db_path, "1", "Ann", 0)
+    enroll(db_path, "2", "Bob", 1)
+    reloader = GalleryReloader(db_path)
+    conn = get_connection(db_path)
+    build_id = reloader.current[0].build_id
+
+    enroll(db_path, "3", "Cy", 2)
+    reloader.reload(conn)
+    gallery, _ = reloader.current
+    assert list(gallery.ids) == ["1", "2", "3"]
+    assert gallery.build_id == build_id  # A pure append keeps the row order
+    assert identify_faces(gallery, [vector(2)])[0][:2] == ("Cy", "3")
+
+    execute(db_path, "UPDATE faces SET name = 'Robert' WHERE id = '2'")
+    execute(db_path, "DELETE FROM face_templates WHERE user_id = '1'")
+    reloader.reload(conn)
+    gallery, _ = reloader.current
+    assert sorted(zip(gallery.ids, gallery.names)) == [("2", "Robert"), ("3", "Cy")]
+    assert gallery.build_id != build_id
+    assert identify_faces(gallery, [vector(1)])[0][:2] == ("Robert", "2")
+    assert identify_faces(gallery, [vector(0)])[0][:2] == ("Unknown", None)
+    assert reloader.stats()["reloads"] == 2
+    assert reloader.stats()["full_reloads"] == 0